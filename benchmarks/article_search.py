@@ -0,0 +1,92 @@
+"""Title LIKE '%x%' scan versus the FTS5 index on a large articles table.
+
+    python -m benchmarks.article_search --articles 1000000
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from data import db_session
+from data.articles_fts import ARTICLES_FTS_DDL
+from models.articles import SearchByTitleModes
+
+SYLLABLES = ["ba", "ko", "ri", "ne", "to", "sa", "mi", "lu", "de", "fa", "gu", "pe", "zo", "hi"]
+
+
+def make_vocabulary(size: int, rnd: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rnd.choices(SYLLABLES, k=rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def seed(articles_count: int, vocabulary, chunk_size: int = 50000) -> None:
+    from data.users import User
+    rnd = random.Random(0)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    with db_session.session_scope() as db_sess:
+        user = User(nickname="bench", email="bench@bench.io", hashed_password="-")
+        db_sess.add(user)
+        db_sess.flush()
+        connection = db_sess.connection().connection
+        # Index once at the end instead of row by row through the insert trigger.
+        connection.execute("DROP TRIGGER articles_fts_insert")
+        for start in range(0, articles_count, chunk_size):
+            connection.executemany(
+                "INSERT INTO articles (title, author_id, content, update_date) "
+                "VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                [
+                    (
+                        " ".join(rnd.choices(vocabulary, cum_weights=weights, k=5)),
+                        user.user_id,
+                        " ".join(rnd.choices(vocabulary, cum_weights=weights, k=60))
+                    ) for _ in range(min(chunk_size, articles_count - start))
+                ]
+            )
+        connection.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        connection.execute(ARTICLES_FTS_DDL[1])
+
+
+async def measure(search_mode: SearchByTitleModes, queries, limit: int) -> float:
+    from model_workers.articles import ArticleModelWorker
+    start = time.perf_counter()
+    for query in queries:
+        async with db_session.async_session_scope() as db_sess:
+            await ArticleModelWorker.get_articles(
+                db_sess, limit=limit, title_search_string=query, search_mode=search_mode
+            )
+    return (time.perf_counter() - start) / len(queries)
+
+
+async def measure_all(queries, limit: int) -> None:
+    for search_mode in (SearchByTitleModes.CONTAINS, SearchByTitleModes.FULL_TEXT):
+        elapsed = await measure(search_mode, queries, limit)
+        print(f"{search_mode.name:>10}: {elapsed * 1000:.2f} ms per query")
+    await db_session.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+    rnd = random.Random(1)
+    vocabulary = make_vocabulary(args.vocabulary, rnd)
+    # Words from the long tail: LIKE has to read most of the table to fill a page.
+    queries = rnd.sample(vocabulary[len(vocabulary) // 10:], args.queries)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, "bench.db"))
+        start = time.perf_counter()
+        seed(args.articles, vocabulary)
+        print(f"Seeded {args.articles} articles in {time.perf_counter() - start:.1f} s")
+        asyncio.run(measure_all(queries, args.limit))
+
+
+if __name__ == "__main__":
+    main()
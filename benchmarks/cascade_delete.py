@@ -0,0 +1,74 @@
+"""Statement count and write-lock time of deleting a prolific author.
+
+    python -m benchmarks.cascade_delete --articles 500 --comments 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from data import db_session
+
+
+def seed(articles_count: int, comments_per_article: int) -> int:
+    from data.users import User
+    from data.articles import Article
+    from data.comments import Comment
+    with db_session.session_scope() as db_sess:
+        author = User(nickname="author", email="author@bench.io", hashed_password="-")
+        reader = User(nickname="reader", email="reader@bench.io", hashed_password="-")
+        db_sess.add_all([author, reader])
+        db_sess.flush()
+        articles = [
+            Article(author_id=author.user_id, title=f"Article {i}") for i in range(articles_count)
+        ]
+        other_articles = [
+            Article(author_id=reader.user_id, title=f"Other {i}") for i in range(articles_count)
+        ]
+        db_sess.add_all(articles + other_articles)
+        db_sess.flush()
+        db_sess.bulk_save_objects([
+            Comment(article_id=article.article_id, author_id=commenter.user_id, content="-")
+            for article, commenter in (
+                [(article, reader) for article in articles] +
+                [(article, author) for article in other_articles]
+            )
+            for _ in range(comments_per_article)
+        ])
+        return author.user_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--comments", type=int, default=20)
+    args = parser.parse_args()
+    statements = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, "bench.db"))
+        user_id = seed(args.articles, args.comments)
+        from model_workers.users import UserModelWorker
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        async def delete_user():
+            async with db_session.async_session_scope() as db_sess:
+                await UserModelWorker.delete_user(db_sess, user_id)
+            await db_session.dispose()
+
+        start = time.perf_counter()
+        asyncio.run(delete_user())
+        elapsed = time.perf_counter() - start
+    rows = 2 * args.articles * args.comments + args.articles + 1
+    print(f"Deleted {rows} rows with {len(statements)} statements in {elapsed * 1000:.1f} ms "
+          f"(the write lock is held for most of that time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Concurrent GET throughput against the in-process app.
+
+Run from the repository root, once on the commit before the async data layer
+and once after it, and compare the requests per second:
+
+    python -m benchmarks.concurrent_reads --articles 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from data import db_session
+
+
+def seed(articles_count: int) -> None:
+    from data.users import User
+    from data.articles import Article
+    with db_session.session_scope() as db_sess:
+        user = User(nickname="bench", email="bench@bench.io", hashed_password="-")
+        db_sess.add(user)
+        db_sess.flush()
+        db_sess.bulk_save_objects([
+            Article(author_id=user.user_id, title=f"Article {i}", content="x" * 512)
+            for i in range(articles_count)
+        ])
+
+
+async def run(requests_count: int, concurrency: int, articles_count: int) -> float:
+    from main import app
+    rnd = random.Random(0)
+    paths = [
+        f"/articles/{rnd.randint(1, articles_count)}" if i % 2 else
+        f"/articles/?limit=10&offset={rnd.randint(0, articles_count - 10)}"
+        for i in range(requests_count)
+    ]
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+
+    async def client_loop(client):
+        while not queue.empty():
+            response = await client.get(queue.get_nowait())
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    await db_session.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, "bench.db"))
+        seed(args.articles)
+        elapsed = asyncio.run(run(args.requests, args.concurrency, args.articles))
+    print(f"{args.requests} requests, concurrency {args.concurrency}: "
+          f"{elapsed:.2f} s, {args.requests / elapsed:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
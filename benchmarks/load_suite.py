@@ -0,0 +1,378 @@
+"""Reproducible load suite: synthetic dataset, request mixes and result comparison.
+
+    python -m benchmarks.load_suite generate bench.db --users 100000 --articles 1000000 \\
+        --comments 10000000
+    python -m benchmarks.load_suite run bench.db --mix browse --requests 20000 \\
+        --output before.json
+    python -m benchmarks.load_suite compare before.json after.json
+
+generate builds the same rows for the same sizes on every run. All users share
+the password BENCHMARK_PASSWORD. run replays a request plan drawn from --seed
+against the in-process app, on a copy of the database unless --in-place is
+given, and writes per-scenario p50/p95/p99 latency and throughput as JSON.
+compare prints the differences between two result files and exits with 1
+when a scenario got slower than --threshold percent.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import sqlalchemy as sa
+
+from data import db_session
+import constants as cst
+
+BENCHMARK_PASSWORD = "benchmark"
+BENCHMARK_AUTHORS = 1000
+
+WORDS = [
+    "guppy", "betta", "tetra", "discus", "angelfish", "molly", "platy", "cichlid",
+    "shrimp", "snail", "moss", "fern", "anubias", "filter", "heater", "substrate",
+    "nitrate", "cycling", "lighting", "breeding", "feeding", "scaping", "driftwood", "co2"
+]
+LOREM = (
+    "Keep the water parameters stable and change a quarter of the water every week. "
+    "Plants compete with algae for light and nutrients, so a dense planting keeps the "
+    "glass clean. New fish need a quarantine tank for two weeks before they join the "
+    "main aquarium. Overfeeding is the most common reason for cloudy water and ammonia "
+    "spikes in a young tank. "
+) * 24
+
+MIXES: Dict[str, Dict[str, int]] = {
+    "browse": {
+        "browse_articles": 40, "browse_comments": 15, "read_article": 30,
+        "read_user": 5, "search_titles": 10,
+    },
+    "mixed": {
+        "browse_articles": 30, "browse_comments": 10, "read_article": 25,
+        "read_user": 5, "search_titles": 10, "post_comment": 18, "login": 2,
+    },
+    "write": {
+        "browse_articles": 20, "read_article": 20, "post_comment": 55, "login": 5,
+    },
+}
+
+
+def _skewed(value: str, count: str) -> str:
+    # Squaring a uniform id gives a long tail: a few prolific authors and busy articles.
+    return f"(({value}) % {count}) * (({value}) % {count}) / {count} + 1"
+
+
+def _generate_sql(table: str) -> str:
+    words = " UNION ALL ".join(f"SELECT {index}, '{word}'" for index, word in enumerate(WORDS))
+    seq = "WITH RECURSIVE seq(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < :count)"
+    date = "strftime('%Y-%m-%d %H:%M:%S', '2024-01-01', '+' || ({}) || ' seconds') || '.000000'"
+    if table == "users":
+        return f"""
+            INSERT INTO users (user_id, nickname, email, hashed_password, registration_date,
+                               description, token_version, articles_count, comments_count)
+            {seq}
+            SELECT i, 'user' || i, 'user' || i || '@bench.io', :hashed_password,
+                   {date.format("i * 60")},
+                   CASE WHEN i % 3 = 0 THEN NULL ELSE 'Aquarist number ' || i END, 0, 0, 0
+            FROM seq
+        """
+    if table == "articles":
+        return f"""
+            INSERT INTO articles (article_id, author_id, title, content, update_date,
+                                  comments_count)
+            {seq}, words(idx, word) AS ({words})
+            SELECT i, {_skewed("i * 7919", ":users")},
+                   w1.word || ' and ' || w2.word || ' ' || i,
+                   substr(:lorem, 1 + i % 400, 200 + (i * 37) % 1800),
+                   {date.format("i * 7")}, 0
+            FROM seq
+            JOIN words w1 ON w1.idx = i % {len(WORDS)}
+            JOIN words w2 ON w2.idx = (i / {len(WORDS)}) % {len(WORDS)}
+        """
+    return f"""
+        INSERT INTO comments (comment_id, article_id, author_id, content, update_date)
+        {seq}
+        SELECT i, {_skewed("i * 104729", ":articles")}, {_skewed("i * 7907", ":users")},
+               'Comment ' || i || ': ' || substr(:lorem, 1 + i % 700, 40 + (i * 13) % 400),
+               {date.format("i")}
+        FROM seq
+    """
+
+
+def generate(args) -> None:
+    from data.articles import Article
+    from data.comments import Comment
+    from data.counters import recompute_counters
+    from data.users import User
+    from depends.password_hash import pwd_context
+    from model_workers.bulk_import import drop_deferred_indexes, build_deferred_indexes
+    if os.path.exists(args.db):
+        sys.exit(f"{args.db} already exists")
+    db_session.global_init(args.db)
+    parameters = {
+        "users": args.users,
+        "articles": args.articles,
+        "lorem": LOREM,
+        "hashed_password": pwd_context.hash(BENCHMARK_PASSWORD)
+    }
+    with db_session.session_scope() as db_sess:
+        connection = db_sess.connection()
+        for model, count in (
+                (User, args.users), (Article, args.articles), (Comment, args.comments)
+        ):
+            table = model.__table__
+            started = time.perf_counter()
+            drop_deferred_indexes(connection, table)
+            connection.execute(sa.text(_generate_sql(table.name)), dict(parameters, count=count))
+            build_deferred_indexes(connection, table)
+            print(f"{table.name}: {count} rows in {time.perf_counter() - started:.1f} s")
+        started = time.perf_counter()
+        recompute_counters(connection)
+        print(f"counters in {time.perf_counter() - started:.1f} s")
+    with db_session.session_scope() as db_sess:
+        db_sess.execute(sa.text("ANALYZE"))
+
+
+def _count_rows(table: str) -> int:
+    with db_session.session_scope() as db_sess:
+        return db_sess.execute(sa.text(f"SELECT max(rowid) FROM {table}")).scalar() or 0
+
+
+def build_plan(
+        mix: Dict[str, int],
+        requests_count: int,
+        seed: int,
+        users: int,
+        articles: int,
+        tokens: List[str]
+) -> List[Tuple[str, str, str, Optional[dict], Optional[dict]]]:
+    rnd = random.Random(seed)
+    scenarios = list(mix)
+    weights = [mix[scenario] for scenario in scenarios]
+    plan = []
+    for scenario in rnd.choices(scenarios, weights, k=requests_count):
+        if scenario == "browse_articles":
+            request = ("GET", "/articles/", None, {
+                "limit": 20,
+                "offset": rnd.randint(0, 200),
+                **({"author_ids": rnd.randint(1, users)} if rnd.random() < 0.3 else {})
+            })
+        elif scenario == "browse_comments":
+            request = ("GET", "/comments/", None, {
+                "limit": 20, "article_ids": rnd.randint(1, articles)
+            })
+        elif scenario == "read_article":
+            request = ("GET", f"/articles/{rnd.randint(1, articles)}", None, None)
+        elif scenario == "read_user":
+            request = ("GET", f"/users/{rnd.randint(1, users)}", None, None)
+        elif scenario == "search_titles":
+            request = ("GET", "/articles/search", None, {
+                "query": rnd.choice(WORDS), "limit": 20
+            }) if rnd.random() < 0.5 else ("GET", "/articles/", None, {
+                "title_search_string": rnd.choice(WORDS), "limit": 20
+            })
+        elif scenario == "post_comment":
+            request = ("POST", "/comments/", {
+                "Authorization": f"Bearer {rnd.choice(tokens)}"
+            }, {"article_id": rnd.randint(1, articles), "content": "Benchmark comment"})
+        else:
+            request = ("POST", "/login", None, {
+                "nickname": f"user{rnd.randint(1, users)}", "password": BENCHMARK_PASSWORD
+            })
+        plan.append((scenario,) + request)
+    return plan
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+async def replay(app, plan, concurrency: int) -> Tuple[Dict[str, List[float]], Dict, float]:
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    queue = collections.deque(plan)
+
+    async def client_loop(client):
+        while queue:
+            scenario, method, path, headers, data = queue.popleft()
+            params, body = (data, None) if method == "GET" else (None, data)
+            started = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body,
+                                            headers=headers)
+            latencies[scenario].append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[scenario] += 1
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+async def run_plan(args, users: int, articles: int) -> dict:
+    from main import app
+    from depends.create_access_token import create_access_token
+    tokens = [
+        create_access_token({"sub": f"user{i}", "uid": i, "ver": 0})
+        for i in range(1, min(users, BENCHMARK_AUTHORS) + 1)
+    ]
+    mix = MIXES[args.mix]
+    try:
+        if args.warmup:
+            await replay(app, build_plan(
+                mix, args.warmup, args.seed + 1, users, articles, tokens
+            ), args.concurrency)
+        latencies, errors, elapsed = await replay(app, build_plan(
+            mix, args.requests, args.seed, users, articles, tokens
+        ), args.concurrency)
+    finally:
+        await db_session.dispose()
+    return {
+        "overall": summarize(
+            [value for values in latencies.values() for value in values],
+            sum(errors.values()),
+            elapsed
+        ),
+        "scenarios": {
+            scenario: summarize(latencies[scenario], errors[scenario], elapsed)
+            for scenario in sorted(latencies)
+        }
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args) -> None:
+    # Every simulated client shares one address, so the per-IP buckets would
+    # turn most writes into 429s.
+    cst.RATE_LIMIT_ENABLED = args.rate_limit
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = args.db
+        if not args.in_place:
+            db_file = os.path.join(tmp_dir, "bench.db")
+            shutil.copyfile(args.db, db_file)
+        db_session.global_init(db_file)
+        users, articles = _count_rows("users"), _count_rows("articles")
+        comments = _count_rows("comments")
+        result = asyncio.run(run_plan(args, users, articles))
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "mix": args.mix,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "rate_limit": args.rate_limit,
+            "dataset": {"users": users, "articles": articles, "comments": comments},
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        **result
+    }
+    print(f"{'scenario':<18}{'requests':>9}{'errors':>8}{'rps':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, stats in list(result["scenarios"].items()) + [("overall", result["overall"])]:
+        print(f"{name:<18}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(args) -> None:
+    with open(args.before) as file:
+        before = json.load(file)
+    with open(args.after) as file:
+        after = json.load(file)
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}, "
+          f"regression threshold {args.threshold:.0f}%")
+    print(f"{'scenario':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}")
+    regressions = []
+    rows = [
+        (name, before["scenarios"][name], after["scenarios"][name])
+        for name in sorted(set(before["scenarios"]) & set(after["scenarios"]))
+    ] + [("overall", before["overall"], after["overall"])]
+    for name, old, new in rows:
+        changes = [_change(old[key], new[key]) for key in ("p50_ms", "p95_ms", "p99_ms")]
+        rps_change = _change(old["rps"], new["rps"])
+        print(f"{name:<18}" + "".join(f"{change:>+8.1f}%" for change in changes)
+              + f"{rps_change:>+8.1f}%")
+        if max(changes[:2]) > args.threshold or -rps_change > args.threshold:
+            regressions.append(name)
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic dataset and load suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate")
+    generate_parser.add_argument("db")
+    generate_parser.add_argument("--users", type=int, default=10000)
+    generate_parser.add_argument("--articles", type=int, default=100000)
+    generate_parser.add_argument("--comments", type=int, default=1000000)
+
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("db")
+    run_parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    run_parser.add_argument("--requests", type=int, default=10000)
+    run_parser.add_argument("--warmup", type=int, default=500)
+    run_parser.add_argument("--concurrency", type=int, default=50)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output")
+    run_parser.add_argument(
+        "--rate-limit", action="store_true", help="keep the rate limits on"
+    )
+    run_parser.add_argument(
+        "--in-place", action="store_true", help="write to the database instead of a copy"
+    )
+
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=15.0)
+
+    args = parser.parse_args()
+    {"generate": generate, "run": run, "compare": compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Mixed read/write load for comparing storage profiles.
+
+    python -m benchmarks.mixed_load --profile default
+    python -m benchmarks.mixed_load --profile wal
+"""
+import argparse
+import asyncio
+import collections
+import os
+import random
+import tempfile
+import time
+
+import httpx
+
+from data import db_session
+from data.storage_profiles import STORAGE_PROFILES
+import constants as cst
+
+
+def seed(users_count: int, articles_count: int) -> None:
+    from data.users import User
+    from data.articles import Article
+    with db_session.session_scope() as db_sess:
+        db_sess.bulk_save_objects([
+            User(nickname=f"user{i}", email=f"user{i}@bench.io", hashed_password="-")
+            for i in range(1, users_count + 1)
+        ])
+        db_sess.bulk_save_objects([
+            Article(author_id=i % users_count + 1, title=f"Article {i}", content="x" * 512)
+            for i in range(articles_count)
+        ])
+
+
+async def run(args) -> None:
+    from main import app
+    from depends.create_access_token import create_access_token
+    tokens = [
+        create_access_token({"sub": f"user{i}", "uid": i, "ver": 0})
+        for i in range(1, args.users + 1)
+    ]
+    rnd = random.Random(0)
+    statuses = collections.Counter()
+    requests = []
+    for _ in range(args.requests):
+        if rnd.random() < args.write_ratio:
+            requests.append(("POST", "/comments/", rnd.choice(tokens), {
+                "article_id": rnd.randint(1, args.articles), "content": "benchmark comment"
+            }))
+        elif rnd.random() < 0.5:
+            requests.append(("GET", f"/articles/{rnd.randint(1, args.articles)}", None, None))
+        else:
+            requests.append(("GET", "/comments/?limit=20", None, None))
+    queue = collections.deque(requests)
+
+    async def client_loop(client):
+        while queue:
+            method, path, token, body = queue.popleft()
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            response = await client.request(method, path, json=body, headers=headers)
+            statuses[response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    await db_session.dispose()
+    print(f"profile {args.profile}: {args.requests / elapsed:.1f} req/s, "
+          f"statuses {dict(sorted(statuses.items()))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", choices=sorted(STORAGE_PROFILES), default="wal")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    cst.RATE_LIMIT_ENABLED = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_session.global_init(os.path.join(tmp_dir, "bench.db"), args.profile)
+        seed(args.users, args.articles)
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
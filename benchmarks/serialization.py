@@ -0,0 +1,71 @@
+"""Rows per second serialized for one page of articles, old path versus fast path.
+
+    python -m benchmarks.serialization --page-size 100 --rounds 2000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from depends import fast_json
+from models.articles import ArticleInDB, ArticleOut
+
+
+def make_rows(page_size: int) -> List[dict]:
+    return [{
+        "article_id": i,
+        "author_id": i % 7 + 1,
+        "title": f"Article number {i}",
+        "content": "Aquarium plants need light and a stable temperature. " * 8,
+        "update_date": datetime(2024, 1, 1, 12, 0, i % 60, 1000 * i)
+    } for i in range(1, page_size + 1)]
+
+
+async def validated_path(rows: List[dict], field) -> bytes:
+    articles = [ArticleInDB(**row) for row in rows]
+    articles = [ArticleOut(**article.dict()) for article in articles]
+    content = await serialize_response(field=field, response_content=articles)
+    return JSONResponse(content).body
+
+
+async def fast_path(rows: List[dict], field) -> bytes:
+    articles = [ArticleInDB.construct(**row) for row in rows]
+    return fast_json.FastJSONResponse(articles).body
+
+
+async def measure(name: str, path, rows: List[dict], rounds: int, field) -> bytes:
+    body = await path(rows, field)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await path(rows, field)
+    seconds = time.perf_counter() - started
+    print(f"{name:<24} {rounds * len(rows) / seconds:>12.0f} rows/s "
+          f"{seconds / rounds * 1000:>8.3f} ms/page")
+    return body
+
+
+async def main(page_size: int, rounds: int) -> None:
+    rows = make_rows(page_size)
+    field = create_response_field(name="response", type_=List[ArticleOut])
+    expected = await measure("validated (before)", validated_path, rows, rounds, field)
+    bodies = [await measure("construct + orjson", fast_path, rows, rounds, field)]
+    orjson, fast_json.orjson = fast_json.orjson, None
+    try:
+        bodies.append(await measure("construct + json", fast_path, rows, rounds, field))
+    finally:
+        fast_json.orjson = orjson
+    for body in bodies:
+        assert body.replace(b" ", b"") == expected.replace(b" ", b""), "bodies differ"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.rounds))
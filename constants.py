@@ -1,5 +1,9 @@
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 30
+REFRESH_TOKEN_BYTES = 32
+TOKEN_VERSION_CACHE_TTL_SECONDS = 60
+TOKEN_VERSION_CACHE_SIZE = 100000
 
 PASSWORD_MIN_LENGTH = 8
 PASSWORD_MAX_LENGTH = 512
@@ -10,3 +14,50 @@ ARTICLE_TITLE_MAX_LENGTH = 256
 ARTICLE_CONTENT_MAX_LENGTH = 4096
 
 COMMENT_CONTENT_MAX_LENGTH = 1024
+
+PASSWORD_HASH_EXECUTOR = "thread"
+PASSWORD_HASH_WORKERS = 4
+PASSWORD_HASH_MAX_QUEUE = 64
+PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = 5
+
+DB_POOL_SIZE = 10
+DB_POOL_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT_SECONDS = 30
+DB_STORAGE_PROFILE = "wal"
+
+GROUP_COMMIT_ENABLED = False
+GROUP_COMMIT_WINDOW_MS = 5
+GROUP_COMMIT_MAX_BATCH_SIZE = 100
+
+BATCH_MAX_SIZE = 500
+MULTI_GET_MAX_IDS = 100
+LATEST_COMMENTS_COUNT = 3
+
+QUERY_CACHE_ENABLED = True
+QUERY_CACHE_TTL_SECONDS = 30
+QUERY_CACHE_MAX_ENTRIES = 1024
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+EXPORT_CHUNK_SIZE = 1000
+BULK_IMPORT_CHUNK_SIZE = 5000
+
+METRICS_ENABLED = True
+
+SQL_SLOW_QUERY_MS = 500
+SQL_REPEATED_STATEMENT_LIMIT = 10
+SQL_STRICT_MODE = False
+
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_STORE = "memory"
+RATE_LIMIT_SQLITE_FILE = "db/rate_limits.db"
+RATE_LIMIT_MAX_KEYS = 100000
+RATE_LIMIT_TRUST_FORWARDED_FOR = False
+RATE_LIMITS = {
+    "auth": [("ip", 20, 60)],
+    "register": [("ip", 10, 600)],
+    "edit_user": [("user", 10, 60)],
+    "create_article": [("user", 30, 60), ("ip", 120, 60)],
+    "create_comment": [("user", 60, 60), ("ip", 300, 60)],
+    "create_article_batch": [("user", 1000, 3600), ("ip", 2000, 3600)],
+    "create_comment_batch": [("user", 2000, 3600), ("ip", 5000, 3600)],
+}
+BATCH_RATE_LIMITS = ("create_article_batch", "create_comment_batch")
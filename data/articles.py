@@ -12,5 +12,11 @@ class Article(SqlAlchemyBase):
     author_id = sq.Column(sq.Integer, sq.ForeignKey("users.user_id"), nullable=False)
     content = sq.Column(sq.String(cst.ARTICLE_CONTENT_MAX_LENGTH))
     update_date = sq.Column(sq.DateTime, default=datetime.now, nullable=False)
+    comments_count = sq.Column(sq.Integer, default=0, server_default="0", nullable=False)
     author = relationship("User", back_populates="articles")
     comments = relationship("Comment", back_populates="article")
+    __table_args__ = (
+        sq.Index("ix_articles_author_id_update_date", "author_id", "update_date"),
+        sq.Index("ix_articles_update_date", "update_date"),
+        sq.Index("ix_articles_comments_count_article_id", "comments_count", "article_id"),
+    )
@@ -0,0 +1,63 @@
+import re
+from typing import Optional
+
+import sqlalchemy as sa
+
+articles_fts = sa.table("articles_fts", sa.column("rowid"), sa.column("title"), sa.column("content"))
+
+ARTICLES_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+        title, content, content='articles', content_rowid='article_id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+        INSERT INTO articles_fts(rowid, title, content)
+        VALUES (new.article_id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_fts_delete AFTER DELETE ON articles BEGIN
+        INSERT INTO articles_fts(articles_fts, rowid, title, content)
+        VALUES ('delete', old.article_id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS articles_fts_update AFTER UPDATE OF title, content ON articles
+    BEGIN
+        INSERT INTO articles_fts(articles_fts, rowid, title, content)
+        VALUES ('delete', old.article_id, old.title, old.content);
+        INSERT INTO articles_fts(rowid, title, content)
+        VALUES (new.article_id, new.title, new.content);
+    END
+    """
+]
+
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+rank = sa.literal_column(f"bm25(articles_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT})")
+snippet = sa.literal_column("snippet(articles_fts, -1, '<b>', '</b>', '...', 16)")
+
+
+def init_articles_fts(connection) -> None:
+    exists = connection.execute(sa.text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+    )).first()
+    for statement in ARTICLES_FTS_DDL:
+        connection.execute(sa.text(statement))
+    if not exists:
+        connection.execute(sa.text("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')"))
+
+
+def build_match_query(search_string: str) -> Optional[str]:
+    terms = []
+    for token in re.findall(r"\w+\*?", search_string):
+        prefix = token.endswith("*")
+        terms.append(f'"{token.rstrip("*")}"' + ("*" if prefix else ""))
+    return " ".join(terms) if terms else None
+
+
+def match(query: str):
+    return sa.text("articles_fts MATCH :fts_query").bindparams(fts_query=query)
@@ -14,3 +14,7 @@ class Comment(SqlAlchemyBase):
     update_date = sq.Column(sq.DateTime, default=datetime.now)
     article = relationship("Article", back_populates="comments")
     author = relationship("User", back_populates="comments")
+    __table_args__ = (
+        sq.Index("ix_comments_article_id_comment_id", "article_id", "comment_id"),
+        sq.Index("ix_comments_author_id_comment_id", "author_id", "comment_id"),
+    )
@@ -0,0 +1,56 @@
+"""Recompute the denormalized counters from the comments and articles tables.
+
+    python -m data.counters [db_file]
+
+Only rows whose stored value drifted are rewritten. The number of repaired
+rows is printed per counter.
+"""
+import sys
+from typing import Dict
+
+import sqlalchemy as sa
+from sqlalchemy import select, update, func
+
+from .articles import Article
+from .comments import Comment
+from .users import User
+
+
+def _counters():
+    return {
+        "articles.comments_count": (Article.__table__.c.comments_count, select(
+            func.count(Comment.comment_id)
+        ).where(Comment.article_id == Article.__table__.c.article_id).scalar_subquery()),
+        "users.articles_count": (User.__table__.c.articles_count, select(
+            func.count(Article.article_id)
+        ).where(Article.author_id == User.__table__.c.user_id).scalar_subquery()),
+        "users.comments_count": (User.__table__.c.comments_count, select(
+            func.count(Comment.comment_id)
+        ).where(Comment.author_id == User.__table__.c.user_id).scalar_subquery()),
+    }
+
+
+def recompute_counters(connection) -> Dict[str, int]:
+    repaired = {}
+    for name, (column, actual) in _counters().items():
+        result = connection.execute(
+            update(column.table).where(column != actual).values({column.name: actual})
+        )
+        repaired[name] = result.rowcount
+    return repaired
+
+
+def main():
+    from .db_session import SqlAlchemyBase
+    from .migrations import migrate
+    engine = sa.create_engine(f"sqlite:///{sys.argv[1] if len(sys.argv) > 1 else 'db/aquahub.db'}")
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    with engine.begin() as connection:
+        repaired = recompute_counters(connection)
+    for name, count in repaired.items():
+        print(f"{name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,90 @@
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
 import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import sqlalchemy.ext.declarative as dec
 
+from .storage_profiles import STORAGE_PROFILES
+from .sql_instrumentation import instrument_engine
+import constants as cst
+
 SqlAlchemyBase = dec.declarative_base()
 
 __factory = None
+__async_engine = None
+__async_read_engine = None
+__async_factory = None
+__async_read_factory = None
 
 
-def global_init(db_file):
-    global __factory
+def _set_pragmas(engine, pragmas) -> None:
+    @sa.event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _create_async_engine(db_file, pragmas, pool_size, max_overflow):
+    engine = create_async_engine(
+        f'sqlite+aiosqlite:///{db_file}',
+        echo=False,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=cst.DB_POOL_TIMEOUT_SECONDS
+    )
+    _set_pragmas(engine.sync_engine, pragmas)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+def global_init(db_file, storage_profile=cst.DB_STORAGE_PROFILE):
+    global __factory, __async_engine, __async_read_engine, __async_factory, __async_read_factory
     if __factory:
         return
     if not db_file or not db_file.strip():
         raise Exception("Необходимо указать файл базы данных.")
-    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
-    print(f"Подключение к базе данных по адресу {conn_str}")
+    profile = STORAGE_PROFILES[storage_profile]
+    db_file = db_file.strip()
+    conn_str = f'sqlite:///{db_file}?check_same_thread=False'
+    print(f"Подключение к базе данных по адресу {conn_str} (профиль {storage_profile})")
     engine = sa.create_engine(conn_str, echo=False)
+    _set_pragmas(engine, profile.pragmas())
+    instrument_engine(engine)
     __factory = orm.sessionmaker(bind=engine)
+    if profile.separate_reader_pool:
+        # SQLite allows one writer at a time: a single pooled connection queues
+        # writers in the pool instead of failing them with "database is locked".
+        __async_engine = _create_async_engine(db_file, profile.pragmas(), 1, 0)
+        __async_read_engine = _create_async_engine(
+            db_file,
+            profile.pragmas() + ["PRAGMA query_only = ON"],
+            cst.DB_POOL_SIZE,
+            cst.DB_POOL_MAX_OVERFLOW
+        )
+    else:
+        __async_engine = __async_read_engine = _create_async_engine(
+            db_file, profile.pragmas(), cst.DB_POOL_SIZE, cst.DB_POOL_MAX_OVERFLOW
+        )
+    __async_factory = orm.sessionmaker(
+        bind=__async_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+    __async_read_factory = orm.sessionmaker(
+        bind=__async_read_engine,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
     from . import __all_models
+    from .migrations import migrate
     SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
 
 
 def create_session() -> Session:
@@ -29,6 +92,56 @@ def create_session() -> Session:
     return __factory()
 
 
+def create_async_session() -> AsyncSession:
+    global __async_factory
+    return __async_factory()
+
+
+def create_async_read_session() -> AsyncSession:
+    global __async_read_factory
+    return __async_read_factory()
+
+
+async def dispose() -> None:
+    global __async_engine, __async_read_engine
+    await __async_engine.dispose()
+    await __async_read_engine.dispose()
+
+
+def _get_pool_stats(engine) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow
+    }
+
+
+def get_pool_stats() -> dict:
+    global __async_engine, __async_read_engine
+    return {
+        "writer": _get_pool_stats(__async_engine),
+        "reader": _get_pool_stats(__async_read_engine)
+    }
+
+
+def on_commit(session: AsyncSession, callback) -> None:
+    session.sync_session.info.setdefault("on_commit", []).append(callback)
+
+
+@sa.event.listens_for(Session, "after_commit")
+def _run_on_commit_callbacks(session: Session) -> None:
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+
+@sa.event.listens_for(Session, "after_rollback")
+def _drop_on_commit_callbacks(session: Session) -> None:
+    session.info.pop("on_commit", None)
+
+
 @contextmanager
 def session_scope():
     session = create_session()
@@ -40,3 +153,16 @@ def session_scope():
         raise
     finally:
         session.close()
+
+
+@asynccontextmanager
+async def async_session_scope(read_only: bool = False):
+    session = create_async_read_session() if read_only else create_async_session()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
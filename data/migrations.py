@@ -0,0 +1,115 @@
+from typing import Callable, List, Tuple
+
+import sqlalchemy as sa
+
+from .articles_fts import ARTICLES_FTS_DDL, init_articles_fts
+from .counters import recompute_counters
+
+
+def _column_exists(connection, table: str, column: str) -> bool:
+    return any(
+        row[1] == column for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")
+    )
+
+
+def _add_users_token_version(connection) -> None:
+    if not _column_exists(connection, "users", "token_version"):
+        connection.exec_driver_sql(
+            "ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0"
+        )
+
+
+def _create_indexes(connection, names: List[str]) -> None:
+    from .db_session import SqlAlchemyBase
+    for table in SqlAlchemyBase.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in names:
+                index.create(connection, checkfirst=True)
+
+
+def _create_filter_indexes(connection) -> None:
+    _create_indexes(connection, [
+        "ix_articles_author_id_update_date",
+        "ix_articles_update_date",
+        "ix_comments_article_id_comment_id",
+        "ix_comments_author_id_comment_id",
+    ])
+
+
+def _add_counters(connection) -> None:
+    for table, column in (
+            ("articles", "comments_count"),
+            ("users", "articles_count"),
+            ("users", "comments_count")
+    ):
+        if not _column_exists(connection, table, column):
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+            )
+    recompute_counters(connection)
+    _create_indexes(connection, [
+        "ix_articles_comments_count_article_id",
+        "ix_users_articles_count_user_id",
+        "ix_users_comments_count_user_id",
+    ])
+
+
+def _restore_deferred_indexes(connection) -> None:
+    # bulk_import --defer-indexes used to leave them dropped when the load failed.
+    from .db_session import SqlAlchemyBase
+    _create_indexes(connection, [
+        index.name for table in SqlAlchemyBase.metadata.sorted_tables for index in table.indexes
+    ])
+    if connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'articles_fts_insert'"
+    ).scalar() is None:
+        connection.exec_driver_sql("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        for statement in ARTICLES_FTS_DDL:
+            connection.exec_driver_sql(statement)
+
+
+def _users_autoincrement(connection) -> None:
+    sql = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+    ).scalar()
+    if "AUTOINCREMENT" in sql.upper():
+        return
+    from .users import User
+    table = User.__table__
+    columns = ", ".join(column.name for column in table.columns)
+    # SQLite can only add AUTOINCREMENT by rebuilding the table. sqlite_sequence starts
+    # at the highest id still present.
+    create_sql = str(sa.schema.CreateTable(table).compile(dialect=connection.dialect))
+    connection.exec_driver_sql(
+        create_sql.replace("CREATE TABLE users ", "CREATE TABLE users_new ", 1)
+    )
+    connection.exec_driver_sql(f"INSERT INTO users_new ({columns}) SELECT {columns} FROM users")
+    connection.exec_driver_sql("DROP TABLE users")
+    connection.exec_driver_sql("ALTER TABLE users_new RENAME TO users")
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "users.token_version", _add_users_token_version),
+    (2, "articles_fts", init_articles_fts),
+    (3, "indexes on author_id, article_id and update_date", _create_filter_indexes),
+    (4, "articles.comments_count, users.articles_count and users.comments_count", _add_counters),
+    (5, "indexes and articles_fts_insert dropped by an interrupted bulk import",
+     _restore_deferred_indexes),
+    (6, "AUTOINCREMENT on users.user_id", _users_autoincrement),
+]
+
+
+def get_schema_version(connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine) -> None:
+    for version, name, migration in MIGRATIONS:
+        with engine.begin() as connection:
+            if get_schema_version(connection) >= version:
+                continue
+            print(f"Применение миграции {version}: {name}")
+            migration(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {version}")
@@ -0,0 +1,75 @@
+"""EXPLAIN QUERY PLAN check for the hot model worker queries.
+
+    python -m data.query_plans [db_file]
+
+Exits with status 1 if any query falls back to a full table scan. Without
+db_file the check runs against a fresh in-memory database.
+"""
+import sys
+from typing import Dict, List
+
+import sqlalchemy as sa
+from sqlalchemy import select, delete
+
+from .articles import Article
+from .comments import Comment
+from .users import User
+
+
+def hot_queries() -> Dict[str, sa.sql.ClauseElement]:
+    return {
+        "articles by author_ids": select(Article).where(
+            Article.author_id.in_([1, 2])
+        ).order_by(Article.article_id).limit(10),
+        "comments by article_ids": select(Comment).where(
+            Comment.article_id.in_([1, 2])
+        ).order_by(Comment.comment_id).limit(10),
+        "comments by author_ids": select(Comment).where(
+            Comment.author_id.in_([1, 2])
+        ).order_by(Comment.comment_id).limit(10),
+        "user by nickname": select(User).where(User.nickname == "nickname"),
+        "articles by comments_count": select(Article).order_by(
+            Article.comments_count.desc(), Article.article_id.desc()
+        ).limit(10),
+        "users by articles_count": select(User).order_by(
+            User.articles_count.desc(), User.user_id.desc()
+        ).limit(10),
+        "users by comments_count": select(User).order_by(
+            User.comments_count.desc(), User.user_id.desc()
+        ).limit(10),
+        "cascade: articles of user": select(Article.article_id).where(Article.author_id == 1),
+        "cascade: comments of article": delete(Comment).where(Comment.article_id == 1),
+        "cascade: comments of user": delete(Comment).where(Comment.author_id == 1),
+    }
+
+
+def find_table_scans(connection) -> List[str]:
+    failures = []
+    for name, statement in hot_queries().items():
+        sql = str(statement.compile(
+            dialect=connection.dialect,
+            compile_kwargs={"literal_binds": True}
+        ))
+        for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+            detail = row[-1]
+            if detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail \
+                    and " USING " not in detail:
+                failures.append(f"{name}: {detail}")
+    return failures
+
+
+def main():
+    from .db_session import SqlAlchemyBase
+    from .migrations import migrate
+    engine = sa.create_engine(f"sqlite:///{sys.argv[1]}" if len(sys.argv) > 1 else "sqlite://")
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    with engine.connect() as connection:
+        failures = find_table_scans(connection)
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from datetime import datetime
+import sqlalchemy as sq
+from .db_session import SqlAlchemyBase
+
+
+class RefreshToken(SqlAlchemyBase):
+    __tablename__ = "refresh_tokens"
+    token_id = sq.Column(sq.Integer, primary_key=True, autoincrement=True)
+    user_id = sq.Column(sq.Integer, sq.ForeignKey("users.user_id"), nullable=False, index=True)
+    token_hash = sq.Column(sq.String(64), unique=True, nullable=False)
+    created_at = sq.Column(sq.DateTime, default=datetime.now, nullable=False)
+    expires_at = sq.Column(sq.DateTime, nullable=False)
@@ -0,0 +1,84 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import sqlalchemy as sa
+
+import constants as cst
+
+MAX_LOGGED_PARAMETERS_LENGTH = 500
+# Execution option for statements that a request is meant to run over and over,
+# such as the keyset pages of an export.
+REPEATS_EXPECTED = "repeats_expected"
+
+totals = {"statements": 0, "seconds": 0.0}
+
+
+class RepeatedStatementError(Exception):
+    pass
+
+
+class RequestSqlStats:
+    __slots__ = ("scope", "statements", "seconds", "shapes")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes: Dict[str, int] = {}
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "-"
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+
+# Stats of the request being handled, shared with the tasks it spawns.
+current_request_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar(
+    "current_request_stats", default=None
+)
+
+
+# Wall time from before_cursor_execute to after_cursor_execute. On the aiosqlite
+# engines it also counts the wait for the event loop to resume the request once the
+# driver thread is done, so under load even primary key lookups can take tens of ms.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    totals["statements"] += 1
+    totals["seconds"] += elapsed
+    stats = current_request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= cst.SQL_SLOW_QUERY_MS:
+        print(
+            f"Slow query {elapsed * 1000:.1f} ms (wall time) in {stats.route if stats else '-'}: "
+            f"{' '.join(statement.split())} {repr(parameters)[:MAX_LOGGED_PARAMETERS_LENGTH]}"
+        )
+    if stats is None:
+        return
+    if context is not None and context.execution_options.get(REPEATS_EXPECTED):
+        return
+    # The statement text has placeholders instead of values, so the same text
+    # executed over and over by one request is the shape of an N+1 loop.
+    repeats = stats.shapes[statement] = stats.shapes.get(statement, 0) + 1
+    if repeats == cst.SQL_REPEATED_STATEMENT_LIMIT + 1:
+        message = f"Statement repeated more than {cst.SQL_REPEATED_STATEMENT_LIMIT} times " \
+                  f"in {stats.route}: {' '.join(statement.split())}"
+        if cst.SQL_STRICT_MODE:
+            raise RepeatedStatementError(message)
+        print(message)
+
+
+def instrument_engine(engine: sa.engine.Engine) -> None:
+    sa.event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    sa.event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,37 @@
+from typing import NamedTuple, Optional, List
+
+
+class StorageProfile(NamedTuple):
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    cache_size: Optional[int] = None
+    mmap_size: Optional[int] = None
+    busy_timeout_ms: Optional[int] = None
+    separate_reader_pool: bool = False
+
+    def pragmas(self) -> List[str]:
+        pragmas = []
+        if self.journal_mode is not None:
+            pragmas.append(f"PRAGMA journal_mode = {self.journal_mode}")
+        if self.synchronous is not None:
+            pragmas.append(f"PRAGMA synchronous = {self.synchronous}")
+        if self.cache_size is not None:
+            pragmas.append(f"PRAGMA cache_size = {self.cache_size}")
+        if self.mmap_size is not None:
+            pragmas.append(f"PRAGMA mmap_size = {self.mmap_size}")
+        if self.busy_timeout_ms is not None:
+            pragmas.append(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        return pragmas
+
+
+STORAGE_PROFILES = {
+    "default": StorageProfile(),
+    "wal": StorageProfile(
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-64000,
+        mmap_size=256 * 1024 * 1024,
+        busy_timeout_ms=5000,
+        separate_reader_pool=True
+    )
+}
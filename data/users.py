@@ -13,5 +13,14 @@ class User(SqlAlchemyBase):
     hashed_password = sq.Column(sq.String(512), nullable=False)
     registration_date = sq.Column(sq.DateTime, default=datetime.now)
     description = sq.Column(sq.String(cst.DESCRIPTION_MAX_LENGTH), nullable=True)
+    token_version = sq.Column(sq.Integer, default=0, server_default="0", nullable=False)
+    articles_count = sq.Column(sq.Integer, default=0, server_default="0", nullable=False)
+    comments_count = sq.Column(sq.Integer, default=0, server_default="0", nullable=False)
     articles = relationship("Article", back_populates="author")
     comments = relationship("Comment", back_populates="author")
+    __table_args__ = (
+        sq.Index("ix_users_articles_count_user_id", "articles_count", "user_id"),
+        sq.Index("ix_users_comments_count_user_id", "comments_count", "user_id"),
+        # Tokens carry the user id, so the id of a deleted user must never come back.
+        {"sqlite_autoincrement": True},
+    )
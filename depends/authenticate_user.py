@@ -1,15 +1,17 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from model_workers.users import UserModelWorker
-from data import db_session
 from models.users import UserInDB
 from .password_hash import verify_password
 from .errors import UserNotFoundError, IncorrectNicknameOrPasswordError
 
 
-def authenticate_user(nickname: str, password: str) -> UserInDB:
+async def authenticate_user(db_sess: AsyncSession, nickname: str, password: str) -> UserInDB:
     try:
-        user: UserInDB = UserModelWorker.get_user_by_nickname(nickname)
+        user: UserInDB = await UserModelWorker.get_user_by_nickname(db_sess, nickname)
     except UserNotFoundError as er:
         raise er
-    if not verify_password(password, user.hashed_password):
+    # Hand the connection back to the pool before the slow bcrypt check.
+    await db_sess.commit()
+    if not await verify_password(password, user.hashed_password):
         raise IncorrectNicknameOrPasswordError()
     return user
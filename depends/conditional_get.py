@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+
+def _to_utc(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def has_conditional_headers(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(
+        request: Request,
+        etag: str,
+        last_modified: Optional[datetime] = None
+) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        )
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        modified_since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if modified_since.tzinfo is None:
+        modified_since = modified_since.replace(tzinfo=timezone.utc)
+    return _to_utc(last_modified) <= modified_since
+
+
+def set_validators(
+        response: Response,
+        etag: str,
+        last_modified: Optional[datetime] = None
+) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(_to_utc(last_modified), usegmt=True)
+
+
+def not_modified(
+        response: Response,
+        etag: str,
+        last_modified: Optional[datetime] = None
+) -> Response:
+    set_validators(response, etag, last_modified)
+    return Response(status_code=304, headers={
+        name: value for name, value in response.headers.items() if name != "content-length"
+    })
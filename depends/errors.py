@@ -24,3 +24,15 @@ class ForbiddenToUserError(Exception):
 
 class CommentNotFoundError(Exception):
     pass
+
+
+class PasswordHashQueueFullError(Exception):
+    pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class InvalidRefreshTokenError(Exception):
+    pass
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any):
+    # Models are written field by field without re-validation, skipping the fields
+    # that were never set, like response_model_exclude_unset does.
+    if isinstance(value, BaseModel):
+        fields_set = value.__fields_set__
+        return {name: field for name, field in value.__dict__.items() if name in fields_set}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json_response(content: Any, response: Response, status_code: int = 200) -> Response:
+    return FastJSONResponse(content, status_code=status_code, headers={
+        name: value for name, value in response.headers.items() if name != "content-length"
+    })
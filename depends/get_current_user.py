@@ -1,23 +1,24 @@
 from fastapi import Depends, HTTPException
 from jose import jwt, JWTError
 
-from .oauth2_scheme import oauth2_scheme
-from data import db_session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from data.users import User
+from .oauth2_scheme import oauth2_scheme
+from .get_db import get_read_db
+from .token_versions import token_versions, MISSING
 
-from models.users import UserOut, UserInDB
 from models.tokens import TokenData
 
 from model_workers.users import UserModelWorker
 
-from depends import errors
-
 import constants as cst
 import jwt_key
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+async def get_current_user(
+        token: str = Depends(oauth2_scheme),
+        db_sess: AsyncSession = Depends(get_read_db)
+) -> TokenData:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -25,13 +26,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     )
     try:
         payload = jwt.decode(token, jwt_key.SECRET_KEY, algorithms=[cst.ALGORITHM])
-        nickname: str = payload.get("sub")
-        if nickname is None:
+        nickname = payload.get("sub")
+        user_id = payload.get("uid")
+        token_version = payload.get("ver")
+        if nickname is None or user_id is None or token_version is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    try:
-        user = UserModelWorker.get_user_by_nickname(nickname)
-    except errors.UserNotFoundError:
+    current_version = token_versions.get_version(user_id)
+    if current_version is MISSING:
+        current_version = await UserModelWorker.get_token_version(db_sess, user_id)
+        token_versions.set_version(user_id, current_version)
+    if current_version is None or current_version != token_version:
         raise credentials_exception
-    return user
+    return TokenData(user_id=user_id, nickname=nickname, token_version=token_version)
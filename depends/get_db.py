@@ -1,5 +1,18 @@
 from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from data import db_session
 
-def get_db(request: Request):
-    return request.state.db
+
+def get_db(request: Request) -> AsyncSession:
+    db_sess = getattr(request.state, "db", None)
+    if db_sess is None:
+        db_sess = request.state.db = db_session.create_async_session()
+    return db_sess
+
+
+def get_read_db(request: Request) -> AsyncSession:
+    db_sess = getattr(request.state, "read_db", None)
+    if db_sess is None:
+        db_sess = request.state.read_db = db_session.create_async_read_session()
+    return db_sess
@@ -0,0 +1,15 @@
+from enum import Enum
+from typing import Optional, List, Set, Type, Callable
+
+from fastapi import Query
+
+from .get_include import parse_enum_values
+
+
+def get_fields(field_enum: Type[Enum]) -> Callable[..., Optional[Set[Enum]]]:
+    def dependency(fields: Optional[List[str]] = Query(
+            None,
+            description=f"Comma separated subset of: {', '.join(item.value for item in field_enum)}"
+    )) -> Optional[Set[Enum]]:
+        return parse_enum_values(field_enum, fields, "field") or None
+    return dependency
@@ -0,0 +1,24 @@
+from enum import Enum
+from typing import Optional, List, Set, Type, Callable
+
+from fastapi import HTTPException, Query
+
+
+def parse_enum_values(enum: Type[Enum], values: Optional[List[str]], kind: str) -> Set[Enum]:
+    result = set()
+    for value in values or []:
+        for name in filter(None, map(str.strip, value.split(","))):
+            try:
+                result.add(enum(name))
+            except ValueError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown {kind}: {name}"
+                )
+    return result
+
+
+def get_include(include_enum: Type[Enum]) -> Callable[..., Set[Enum]]:
+    def dependency(include: Optional[List[str]] = Query(None)) -> Set[Enum]:
+        return parse_enum_values(include_enum, include, "include")
+    return dependency
@@ -2,25 +2,64 @@ from datetime import timedelta
 from fastapi import HTTPException
 from .create_access_token import create_access_token
 from .authenticate_user import authenticate_user
+from model_workers.refresh_tokens import RefreshTokenModelWorker
 from models.users import UserInDB
-from .errors import UserNotFoundError, IncorrectNicknameOrPasswordError
+from .errors import UserNotFoundError, IncorrectNicknameOrPasswordError, \
+    PasswordHashQueueFullError, InvalidRefreshTokenError
 import constants as cst
 
 
-def get_token(nickname, password):
+def _create_user_access_token(user_id: int, nickname: str, token_version: int) -> str:
+    access_token_expires = timedelta(minutes=cst.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": nickname, "uid": user_id, "ver": token_version},
+        expires_delta=access_token_expires
+    )
+
+
+async def get_token(read_db_sess, db_sess, nickname, password):
     bad_login_exception = HTTPException(
             status_code=401,
             detail="Incorrect nickname or password",
             headers={"WWW-Authenticate": "Bearer"}
         )
     try:
-        user: UserInDB = authenticate_user(nickname, password)
+        user: UserInDB = await authenticate_user(read_db_sess, nickname, password)
     except UserNotFoundError:
         raise bad_login_exception
     except IncorrectNicknameOrPasswordError:
         raise bad_login_exception
-    access_token_expires = timedelta(minutes=cst.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.nickname}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    except PasswordHashQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(cst.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS)}
+        )
+    refresh_token = await RefreshTokenModelWorker.create_refresh_token(db_sess, user.user_id)
+    return {
+        "access_token": _create_user_access_token(
+            user.user_id, user.nickname, user.token_version
+        ),
+        "token_type": "bearer",
+        "refresh_token": refresh_token
+    }
+
+
+async def refresh_token(db_sess, token):
+    try:
+        user, new_refresh_token = await RefreshTokenModelWorker.rotate_refresh_token(
+            db_sess, token
+        )
+    except InvalidRefreshTokenError:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return {
+        "access_token": _create_user_access_token(
+            user.user_id, user.nickname, user.token_version
+        ),
+        "token_type": "bearer",
+        "refresh_token": new_refresh_token
+    }
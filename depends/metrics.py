@@ -0,0 +1,203 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Iterator, Sequence, Tuple
+
+from data.sql_instrumentation import totals as sql_totals
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PASSWORD_HASH_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(
+        f'{name}="' + str(value).replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+        + '"' for name, value in zip(names, values)
+    ) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per bucket counts (the last one is +Inf), sum]
+        self._values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterator[str]:
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(names, labels + (_format_value(bound),))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Gauge:
+    type = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str],
+            collect: Callable[[], Iterable[Tuple[Labels, float]]]
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class CallbackCounter(Gauge):
+    type = "counter"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(Counter(
+    "aquahub_http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "aquahub_http_request_duration_seconds",
+    "HTTP request latency by method and route template.",
+    ("method", "route")
+))
+db_queries_per_request = registry.register(Histogram(
+    "aquahub_db_queries_per_request",
+    "SQL statements executed while handling one request.",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS
+))
+db_seconds_per_request = registry.register(Histogram(
+    "aquahub_db_seconds_per_request",
+    "Wall time of SQL statements, event loop waits included, while handling one request.",
+    ("method", "route")
+))
+registry.register(CallbackCounter(
+    "aquahub_db_queries_total",
+    "SQL statements executed.",
+    (),
+    lambda: [((), sql_totals["statements"])]
+))
+registry.register(CallbackCounter(
+    "aquahub_db_query_seconds_total",
+    "Wall time of SQL statements, event loop waits included.",
+    (),
+    lambda: [((), sql_totals["seconds"])]
+))
+password_hash_duration_seconds = registry.register(Histogram(
+    "aquahub_password_hash_duration_seconds",
+    "bcrypt time by operation (hash or verify).",
+    ("operation",),
+    PASSWORD_HASH_BUCKETS
+))
+password_hash_wait_seconds = registry.register(Histogram(
+    "aquahub_password_hash_wait_seconds",
+    "Time spent waiting for a free password hash worker."
+))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # Route templates, not raw paths, keep the label set small.
+            route = scope.get("route")
+            labels = (scope["method"], route.path if route is not None else "unmatched")
+            http_requests_total.inc(labels + (str(status[0]),))
+            http_request_duration_seconds.observe(elapsed, labels)
+            sql_stats = scope.get("state", {}).get("sql_stats")
+            if sql_stats is not None:
+                db_queries_per_request.observe(sql_stats.statements, labels)
+                db_seconds_per_request.observe(sql_stats.seconds, labels)
+
+
+def instrument(app) -> None:
+    app.add_middleware(MetricsMiddleware)
@@ -1,11 +1,125 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+
 from passlib.context import CryptContext
 
+from .errors import PasswordHashQueueFullError
+from .metrics import password_hash_duration_seconds, password_hash_wait_seconds
+import constants as cst
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
-def get_password_hash(password):
+def _hash(password):
     return pwd_context.hash(password)
 
 
-def verify_password(password, hashed_password):
+def _verify(password, hashed_password):
     return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHashPool:
+    def __init__(
+            self,
+            workers: int,
+            max_queue: int,
+            queue_timeout: float,
+            use_processes: bool = False
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        return self._semaphore
+
+    async def run(self, func, *args):
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHashQueueFullError()
+        semaphore = self._get_semaphore()
+        self.queue_depth += 1
+        wait_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise PasswordHashQueueFullError()
+        finally:
+            self.queue_depth -= 1
+        wait = time.perf_counter() - wait_start
+        self.wait_seconds_total += wait
+        password_hash_wait_seconds.observe(wait)
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), func, *args
+            )
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight -= 1
+            self.completed += 1
+            self.hash_seconds_total += elapsed
+            self.hash_seconds_max = max(self.hash_seconds_max, elapsed)
+            password_hash_duration_seconds.observe(elapsed, (func.__name__.lstrip("_"),))
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "executor": "process" if self.use_processes else "thread",
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_hash_ms": self.hash_seconds_total / self.completed * 1000
+            if self.completed else 0.0,
+            "max_hash_ms": self.hash_seconds_max * 1000,
+            "avg_wait_ms": self.wait_seconds_total / self.completed * 1000
+            if self.completed else 0.0
+        }
+
+
+password_hash_pool = PasswordHashPool(
+    workers=cst.PASSWORD_HASH_WORKERS,
+    max_queue=cst.PASSWORD_HASH_MAX_QUEUE,
+    queue_timeout=cst.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+    use_processes=cst.PASSWORD_HASH_EXECUTOR == "process"
+)
+
+
+async def get_password_hash(password):
+    return await password_hash_pool.run(_hash, password)
+
+
+async def verify_password(password, hashed_password):
+    return await password_hash_pool.run(_verify, password, hashed_password)
@@ -0,0 +1,234 @@
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response
+
+from models.tokens import TokenData
+from .get_current_user import get_current_user
+from .metrics import registry, Counter
+import constants as cst
+
+rate_limited_total = registry.register(Counter(
+    "aquahub_rate_limited_total",
+    "Requests rejected with 429 by rate limit rule.",
+    ("rule",)
+))
+
+
+class RateLimitRule(NamedTuple):
+    key: str
+    capacity: int
+    period_seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+class BucketState(NamedTuple):
+    allowed: bool
+    tokens: float
+
+
+# (key, capacity, rate) of every bucket a request is charged to.
+Bucket = Tuple[str, int, float]
+
+
+def _take_all(
+        buckets: List[Bucket],
+        saved: List[Tuple[float, float]],
+        now: float,
+        cost: int
+) -> List[BucketState]:
+    # Tokens are taken only if every bucket has enough, so a request denied by one
+    # rule (say, a shared IP) does not drain the others.
+    states = [
+        BucketState(tokens >= cost, tokens) for tokens in (
+            min(capacity, tokens + (now - updated_at) * rate)
+            for (_, capacity, rate), (tokens, updated_at) in zip(buckets, saved)
+        )
+    ]
+    if all(state.allowed for state in states):
+        return [BucketState(True, state.tokens - cost) for state in states]
+    return states
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, buckets: List[Bucket], cost: int) -> List[BucketState]:
+        now = time.monotonic()
+        saved = [self._buckets.pop(key, (capacity, now)) for key, capacity, _ in buckets]
+        states = _take_all(buckets, saved, now, cost)
+        for (key, _, _), state in zip(buckets, states):
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            self._buckets[key] = (state.tokens, now)
+        return states
+
+
+class SqliteBucketStore:
+    # Buckets are read and written back in one IMMEDIATE transaction, so several
+    # worker processes can share them through the same file.
+    SAVE_SQL = """
+        INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, allowed)
+        VALUES (?, ?, ?, ?)
+    """
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.db_file,
+                timeout=5,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    allowed INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._connection = connection
+        return self._connection
+
+    def _take(self, buckets: List[Bucket], cost: int) -> List[BucketState]:
+        with self._lock:
+            connection = self._get_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                saved = {
+                    key: (tokens, updated_at) for key, tokens, updated_at in connection.execute(
+                        "SELECT key, tokens, updated_at FROM rate_limit_buckets "
+                        f"WHERE key IN ({', '.join('?' * len(buckets))})",
+                        [key for key, _, _ in buckets]
+                    )
+                }
+                states = _take_all(buckets, [
+                    saved.get(key, (capacity, now)) for key, capacity, _ in buckets
+                ], now, cost)
+                connection.executemany(self.SAVE_SQL, [
+                    (key, state.tokens, now, state.allowed)
+                    for (key, _, _), state in zip(buckets, states)
+                ])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return states
+
+    async def take(self, buckets: List[Bucket], cost: int) -> List[BucketState]:
+        return await asyncio.to_thread(self._take, buckets, cost)
+
+
+def _get_rules(rule_name: str) -> List[RateLimitRule]:
+    return [RateLimitRule(*rule) for rule in cst.RATE_LIMITS.get(rule_name, [])]
+
+
+def _check_batch_rules() -> None:
+    # Batch endpoints charge one token per item, so a bucket smaller than
+    # BATCH_MAX_SIZE would turn every large batch into a 413.
+    for rule_name in cst.BATCH_RATE_LIMITS:
+        for rule in _get_rules(rule_name):
+            if rule.capacity < cst.BATCH_MAX_SIZE:
+                raise ValueError(
+                    f"RATE_LIMITS[{rule_name!r}] capacity {rule.capacity} is below "
+                    f"BATCH_MAX_SIZE {cst.BATCH_MAX_SIZE}"
+                )
+
+
+def _client_ip(request: Request) -> str:
+    if cst.RATE_LIMIT_TRUST_FORWARDED_FOR and "x-forwarded-for" in request.headers:
+        return request.headers["x-forwarded-for"].split(",")[0].strip()
+    return request.client.host if request.client is not None else "unknown"
+
+
+async def check_rate_limit(
+        rule_name: str,
+        request: Request,
+        response: Response,
+        user_id: Optional[int] = None,
+        cost: int = 1
+) -> None:
+    if not cst.RATE_LIMIT_ENABLED:
+        return
+    rules = _get_rules(rule_name)
+    if not rules:
+        return
+    policy = ", ".join(f"{rule.capacity};w={rule.period_seconds:g}" for rule in rules)
+    for rule in rules:
+        # A batch larger than the bucket could never pass, waiting would not help.
+        if cost > rule.capacity:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch of {cost} items exceeds the rate limit of {rule.capacity} "
+                       f"per {rule.period_seconds:g} seconds",
+                headers={"RateLimit-Policy": policy}
+            )
+    states = await rate_limit_store.take([(
+        f"{rule_name}:user:{user_id}" if rule.key == "user" and user_id is not None
+        else f"{rule_name}:ip:{_client_ip(request)}",
+        rule.capacity,
+        rule.rate
+    ) for rule in rules], cost)
+    headers: Dict[str, str] = {}
+    lowest_remaining = None
+    denied = False
+    retry_after = 0.0
+    for rule, state in zip(rules, states):
+        if not state.allowed:
+            denied = True
+            retry_after = max(retry_after, (cost - state.tokens) / rule.rate)
+        remaining = math.floor(state.tokens)
+        if lowest_remaining is None or remaining < lowest_remaining:
+            lowest_remaining = remaining
+            headers["RateLimit-Limit"] = str(rule.capacity)
+            headers["RateLimit-Remaining"] = str(remaining)
+            headers["RateLimit-Reset"] = str(
+                math.ceil((rule.capacity - state.tokens) / rule.rate)
+            )
+    headers["RateLimit-Policy"] = policy
+    if denied:
+        rate_limited_total.inc((rule_name,))
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers=dict(headers, **{"Retry-After": str(math.ceil(retry_after))})
+        )
+    response.headers.update(headers)
+
+
+def rate_limit(rule_name: str):
+    if any(rule.key == "user" for rule in _get_rules(rule_name)):
+        async def dependency(
+                request: Request,
+                response: Response,
+                current_user: TokenData = Depends(get_current_user)
+        ) -> None:
+            await check_rate_limit(rule_name, request, response, current_user.user_id)
+    else:
+        async def dependency(request: Request, response: Response) -> None:
+            await check_rate_limit(rule_name, request, response)
+    return dependency
+
+
+_check_batch_rules()
+rate_limit_store = SqliteBucketStore(cst.RATE_LIMIT_SQLITE_FILE) \
+    if cst.RATE_LIMIT_STORE == "sqlite" else MemoryBucketStore(cst.RATE_LIMIT_MAX_KEYS)
@@ -0,0 +1,18 @@
+from data.sql_instrumentation import current_request_stats, RequestSqlStats
+
+
+class SqlStatsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestSqlStats(scope)
+        scope.setdefault("state", {})["sql_stats"] = stats
+        token = current_request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request_stats.reset(token)
@@ -0,0 +1,34 @@
+import time
+from typing import Dict, Optional, Tuple
+
+import constants as cst
+
+MISSING = object()
+
+
+class TokenVersionTable:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._versions: Dict[int, Tuple[Optional[int], float]] = {}
+
+    def get_version(self, user_id: int):
+        entry = self._versions.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            return MISSING
+        return entry[0]
+
+    def set_version(self, user_id: int, version: Optional[int]) -> None:
+        self._versions.pop(user_id, None)
+        if len(self._versions) >= self.max_size:
+            self._versions.pop(next(iter(self._versions)))
+        self._versions[user_id] = (version, time.monotonic() + self.ttl)
+
+    def revoke(self, user_id: int) -> None:
+        self.set_version(user_id, None)
+
+
+token_versions = TokenVersionTable(
+    ttl=cst.TOKEN_VERSION_CACHE_TTL_SECONDS,
+    max_size=cst.TOKEN_VERSION_CACHE_SIZE
+)
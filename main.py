@@ -1,16 +1,23 @@
 from datetime import timedelta
 
-from fastapi import FastAPI, Request, Response, Depends
+from fastapi import FastAPI, Request, Depends
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from depends.get_token import get_token
+from depends.get_token import get_token, refresh_token
+from depends.get_db import get_db, get_read_db
+from depends.metrics import instrument
+from depends.sql_stats import SqlStatsMiddleware
+from depends.rate_limit import rate_limit
 
 from data import db_session
 
-from models.tokens import Token
+from models.tokens import Token, RefreshTokenData
 from models.users import UserLoginData
 
-from routers import users, articles, comments
+from routers import users, articles, comments, stats, metrics
+
+import constants as cst
 
 tags_metadata = [
     {
@@ -28,6 +35,10 @@ tags_metadata = [
     {
         "name": "authorization",
         "description": "Operations for getting **tokens**"
+    },
+    {
+        "name": "stats",
+        "description": "Runtime **statistics**"
     }
 ]
 
@@ -41,26 +52,68 @@ app = FastAPI(
 app.include_router(users.router)
 app.include_router(articles.router)
 app.include_router(comments.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
 
 db_session.global_init("db/aquahub.db")
 
 
+@app.on_event("shutdown")
+async def close_db_connections():
+    await db_session.dispose()
+
+
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
-    response = Response("Internal server error", status_code=500)
     try:
-        request.state.db = db_session.create_session()
         response = await call_next(request)
+        db_sess = getattr(request.state, "db", None)
+        if db_sess is not None and response.status_code < 400:
+            await db_sess.commit()
     finally:
-        pass
+        for name in ("db", "read_db"):
+            db_sess = getattr(request.state, name, None)
+            if db_sess is not None:
+                await db_sess.close()
     return response
 
 
-@app.post("/token", response_model=Token, tags=["authorization"])
-async def get_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    return get_token(form_data.username, form_data.password)
+app.add_middleware(SqlStatsMiddleware)
+if cst.METRICS_ENABLED:
+    instrument(app)
+
+
+@app.post(
+    "/token",
+    response_model=Token,
+    tags=["authorization"],
+    dependencies=[Depends(rate_limit("auth"))]
+)
+async def get_access_token(
+        form_data: OAuth2PasswordRequestForm = Depends(),
+        read_db_sess: AsyncSession = Depends(get_read_db),
+        db_sess: AsyncSession = Depends(get_db)
+):
+    return await get_token(read_db_sess, db_sess, form_data.username, form_data.password)
+
+
+@app.post(
+    "/login",
+    response_model=Token,
+    tags=["authorization"],
+    dependencies=[Depends(rate_limit("auth"))]
+)
+async def login_for_access_token(
+        user_data: UserLoginData,
+        read_db_sess: AsyncSession = Depends(get_read_db),
+        db_sess: AsyncSession = Depends(get_db)
+):
+    return await get_token(read_db_sess, db_sess, user_data.nickname, user_data.password)
 
 
-@app.post("/login", response_model=Token, tags=["authorization"])
-async def login_for_access_token(user_data: UserLoginData):
-    return get_token(user_data.nickname, user_data.password)
+@app.post("/token/refresh", response_model=Token, tags=["authorization"])
+async def refresh_access_token(
+        token_data: RefreshTokenData,
+        db_sess: AsyncSession = Depends(get_db)
+):
+    return await refresh_token(db_sess, token_data.refresh_token)
@@ -1,13 +1,36 @@
+from collections import Counter
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Union, Set, AsyncIterator
+
+from sqlalchemy import select, delete, update, false, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from data import db_session
 from data.articles import Article
+from data.articles_fts import articles_fts, build_match_query, match, rank, snippet
+from data.comments import Comment
 from data.users import User
 from models.articles import ArticleInDB, CreateArticleData, \
-    SearchByTitleModes, EditArticleData
+    SearchByTitleModes, EditArticleData, ArticleSearchResult, \
+    ArticleIncludes, ArticleExpandedInDB, ArticleOrder, ArticleField
+from models.users import UserShortOut
 from .comments import CommentModelWorker
+from .batch import insert_many
+from .export import iter_keyset_chunks
+from .counters import add_to_counter
+from .group_commit import GroupCommitQueue
+from .pagination import decode_cursor
+from .query_cache import query_cache
 from depends import errors
+import constants as cst
+
+
+ARTICLE_COLUMNS = (
+    Article.article_id,
+    Article.author_id,
+    Article.title,
+    Article.content,
+    Article.update_date
+)
 
 
 class ArticleModelWorker:
@@ -22,7 +45,7 @@ class ArticleModelWorker:
 
     @staticmethod
     def _sql_article_to_pydantic_article(article: Article) -> ArticleInDB:
-        return ArticleInDB(
+        return ArticleInDB.construct(
             article_id=article.article_id,
             author_id=article.author_id,
             title=article.title,
@@ -31,87 +54,312 @@ class ArticleModelWorker:
         )
 
     @staticmethod
-    def get_article(article_id: int) -> ArticleInDB:
-        with db_session.session_scope() as db_sess:
-            article = db_sess.query(Article).get(article_id)
-            if not article:
-                raise errors.ArticleNotFoundError()
-            return ArticleModelWorker._sql_article_to_pydantic_article(article)
+    def _full_text_search(query, search_string: str):
+        match_query = build_match_query(search_string)
+        if match_query is None:
+            return query.where(false())
+        return query.join(
+            articles_fts, articles_fts.c.rowid == Article.article_id
+        ).where(match(match_query)).order_by(None).order_by(rank, Article.article_id)
+
+    @staticmethod
+    async def get_article(db_sess: AsyncSession, article_id: int) -> ArticleInDB:
+        article = await db_sess.get(Article, article_id)
+        if not article:
+            raise errors.ArticleNotFoundError()
+        return ArticleModelWorker._sql_article_to_pydantic_article(article)
+
+    @staticmethod
+    async def get_article_update_date(db_sess: AsyncSession, article_id: int) -> datetime:
+        update_date = await db_sess.scalar(
+            select(Article.update_date).where(Article.article_id == article_id)
+        )
+        if update_date is None:
+            raise errors.ArticleNotFoundError()
+        return update_date
+
+    @staticmethod
+    async def get_articles_by_ids(
+            db_sess: AsyncSession,
+            article_ids: List[int]
+    ) -> List[Optional[ArticleInDB]]:
+        articles = {
+            article.article_id: ArticleModelWorker._sql_article_to_pydantic_article(article)
+            for article in await db_sess.scalars(
+                select(Article).where(Article.article_id.in_(set(article_ids)))
+            )
+        }
+        return [articles.get(article_id) for article_id in article_ids]
 
     @staticmethod
-    def get_articles(
+    async def get_articles(
+            db_sess: AsyncSession,
             limit: int = 10,
             offset: int = 0,
             author_ids: Optional[List[int]] = None,
             title_search_string: Optional[str] = None,
-            search_mode: SearchByTitleModes = SearchByTitleModes.STARTSWITH
+            search_mode: SearchByTitleModes = SearchByTitleModes.STARTSWITH,
+            cursor: Optional[str] = None,
+            include: Optional[Set[ArticleIncludes]] = None,
+            order: ArticleOrder = ArticleOrder.ID,
+            fields: Optional[Set[ArticleField]] = None
     ) -> List[ArticleInDB]:
-        with db_session.session_scope() as db_sess:
-            articles = db_sess.query(Article)
-            if author_ids is not None:
-                articles = articles.filter(Article.author_id.in_(author_ids))
-            if title_search_string is not None:
-                if search_mode == SearchByTitleModes.EQUALS:
-                    articles = articles.filter(Article.title == title_search_string)
-                elif search_mode == SearchByTitleModes.EQUALS_CASE_INSENSITIVE:
-                    articles = articles.filter(Article.title.like(title_search_string))
-                elif search_mode == SearchByTitleModes.STARTSWITH:
-                    articles = articles.filter(Article.title.startswith(title_search_string))
-                elif search_mode == SearchByTitleModes.CONTAINS:
-                    articles = articles.filter(Article.title.like(f"%{title_search_string}%"))
-                else:
-                    print(f"Unknown title search mode: {search_mode}")
-            articles = articles.limit(limit).offset(offset)
-            return [
-                ArticleModelWorker._sql_article_to_pydantic_article(article) for article in articles
-            ]
+        include = frozenset(include or ())
+        fields = frozenset(field.value for field in fields) if fields else None
+        entities = ["articles"]
+        if ArticleIncludes.AUTHOR in include:
+            entities.append("users")
+        if ArticleIncludes.LATEST_COMMENTS in include:
+            entities.append("comments")
+        # Comment writes only bump the counters generation, so lists that never
+        # select comments_count stay cached through a stream of new comments.
+        if ArticleIncludes.COMMENTS_COUNT in include or order == ArticleOrder.COMMENTS_COUNT:
+            entities.append("article_counters")
+        key = (
+            "articles", limit, offset,
+            tuple(sorted(set(author_ids))) if author_ids is not None else None,
+            title_search_string, search_mode.value if title_search_string is not None else None,
+            cursor, tuple(sorted(item.value for item in include)), order.value,
+            tuple(sorted(fields)) if fields is not None else None
+        )
+        return await query_cache.get_or_load(
+            db_sess, key, entities, lambda: ArticleModelWorker._get_articles(
+                db_sess, limit, offset, author_ids,
+                title_search_string, search_mode, cursor, include, order, fields
+            )
+        )
 
     @staticmethod
-    def create_new_article(author_id: int, article_data: CreateArticleData) -> ArticleInDB:
-        with db_session.session_scope() as db_sess:
-            user = db_sess.query(User).get(author_id)
-            if not user:
-                raise errors.UserNotFoundError()
-            db_article = ArticleInDB(
-                article_id=-1,
-                author_id=author_id,
-                title=article_data.title,
-                content=article_data.content
+    async def _get_articles(
+            db_sess: AsyncSession,
+            limit: int,
+            offset: int,
+            author_ids: Optional[List[int]],
+            title_search_string: Optional[str],
+            search_mode: SearchByTitleModes,
+            cursor: Optional[str],
+            include: Set[ArticleIncludes],
+            order: ArticleOrder,
+            fields: Optional[Set[str]]
+    ) -> List[ArticleInDB]:
+        include = set(include)
+        # article_id is always selected, the cursor and latest_comments are keyed by it.
+        articles = select(*(
+            column for column in ARTICLE_COLUMNS
+            if fields is None or column.key in fields or column.key == "article_id"
+        )).order_by(Article.article_id)
+        if order == ArticleOrder.COMMENTS_COUNT:
+            include.add(ArticleIncludes.COMMENTS_COUNT)
+        if ArticleIncludes.AUTHOR in include:
+            articles = articles.add_columns(
+                User.user_id.label("author_user_id"),
+                User.nickname.label("author_nickname")
+            ).join(
+                User, User.user_id == Article.author_id
             )
-            article: Article = ArticleModelWorker._pydantic_article_to_sql_article(db_article)
-            db_sess.add(article)
-            db_sess.commit()
-            db_article.article_id = article.article_id
-            db_article.update_date = article.update_date
-            return db_article
+        if ArticleIncludes.COMMENTS_COUNT in include:
+            articles = articles.add_columns(Article.comments_count)
+        if cursor is not None and order == ArticleOrder.COMMENTS_COUNT:
+            last_comments_count, last_article_id = decode_cursor(cursor, 2)
+            articles = articles.where(
+                tuple_(Article.comments_count, Article.article_id) <
+                tuple_(last_comments_count, last_article_id)
+            )
+        elif cursor is not None:
+            last_article_id, = decode_cursor(cursor)
+            articles = articles.where(Article.article_id > last_article_id)
+        if author_ids is not None:
+            articles = articles.where(Article.author_id.in_(author_ids))
+        if title_search_string is not None:
+            if search_mode == SearchByTitleModes.EQUALS:
+                articles = articles.where(Article.title == title_search_string)
+            elif search_mode == SearchByTitleModes.EQUALS_CASE_INSENSITIVE:
+                articles = articles.where(Article.title.like(title_search_string))
+            elif search_mode == SearchByTitleModes.STARTSWITH:
+                articles = articles.where(Article.title.startswith(title_search_string))
+            elif search_mode == SearchByTitleModes.CONTAINS:
+                articles = articles.where(Article.title.like(f"%{title_search_string}%"))
+            elif search_mode == SearchByTitleModes.FULL_TEXT:
+                if cursor is not None:
+                    raise errors.InvalidCursorError()
+                articles = ArticleModelWorker._full_text_search(articles, title_search_string)
+            else:
+                print(f"Unknown title search mode: {search_mode}")
+        if order == ArticleOrder.COMMENTS_COUNT:
+            articles = articles.order_by(None).order_by(
+                Article.comments_count.desc(), Article.article_id.desc()
+            )
+        # Rows come straight from the selected columns, already valid, so the models
+        # are built with construct() instead of being validated field by field.
+        rows = (await db_sess.execute(articles.limit(limit).offset(offset))).all()
+        if not include:
+            return [ArticleInDB.construct(**row._mapping) for row in rows]
+        latest_comments = await CommentModelWorker.get_latest_comments(
+            db_sess,
+            [row.article_id for row in rows]
+        ) if ArticleIncludes.LATEST_COMMENTS in include else None
+        expanded_articles = []
+        for row in rows:
+            article = dict(row._mapping)
+            if ArticleIncludes.AUTHOR in include:
+                article["author"] = UserShortOut.construct(
+                    user_id=article.pop("author_user_id"),
+                    nickname=article.pop("author_nickname")
+                )
+            if latest_comments is not None:
+                article["latest_comments"] = latest_comments[row.article_id]
+            expanded_articles.append(ArticleExpandedInDB.construct(**article))
+        return expanded_articles
+
+    @staticmethod
+    async def export_articles(
+            author_ids: Optional[List[int]] = None,
+            chunk_size: int = cst.EXPORT_CHUNK_SIZE
+    ) -> AsyncIterator[List[ArticleInDB]]:
+        articles = select(*ARTICLE_COLUMNS)
+        if author_ids is not None:
+            articles = articles.where(Article.author_id.in_(author_ids))
+        async for rows in iter_keyset_chunks(articles, Article.article_id, chunk_size):
+            yield [ArticleInDB.construct(**row._mapping) for row in rows]
+
+    @staticmethod
+    async def search_articles(
+            db_sess: AsyncSession,
+            query: str,
+            limit: int = 10,
+            offset: int = 0,
+            author_ids: Optional[List[int]] = None
+    ) -> List[ArticleSearchResult]:
+        # snippet() and bm25() need the articles_fts join, which a query without terms skips.
+        if build_match_query(query) is None:
+            return []
+        rows = ArticleModelWorker._full_text_search(select(Article, snippet, rank), query)
+        if author_ids is not None:
+            rows = rows.where(Article.author_id.in_(author_ids))
+        rows = await db_sess.execute(rows.limit(limit).offset(offset))
+        return [
+            ArticleSearchResult(
+                **ArticleModelWorker._sql_article_to_pydantic_article(article).dict(),
+                snippet=article_snippet,
+                rank=article_rank
+            ) for article, article_snippet, article_rank in rows
+        ]
 
     @staticmethod
-    def edit_article(user_id: int, article_id: int, article_data: EditArticleData) -> ArticleInDB:
-        with db_session.session_scope() as db_sess:
-            article = db_sess.query(Article).get(article_id)
-            if not article:
-                raise errors.ArticleNotFoundError()
-            if article.author_id != user_id:
-                raise errors.ForbiddenToUserError()
-            if article_data.title is not None:
-                article.title = article_data.title
-            if article_data.content is not None:
-                article.content = article_data.content
-            article.update_date = datetime.now()
-            return ArticleModelWorker._sql_article_to_pydantic_article(article)
+    async def create_new_article(
+            db_sess: AsyncSession,
+            author_id: int,
+            article_data: CreateArticleData
+    ) -> ArticleInDB:
+        if article_group_commit is not None:
+            return await article_group_commit.submit((author_id, article_data))
+        user = await db_sess.get(User, author_id)
+        if not user:
+            raise errors.UserNotFoundError()
+        db_article = ArticleInDB(
+            article_id=-1,
+            author_id=author_id,
+            title=article_data.title,
+            content=article_data.content
+        )
+        article: Article = ArticleModelWorker._pydantic_article_to_sql_article(db_article)
+        db_sess.add(article)
+        await db_sess.flush()
+        await add_to_counter(db_sess, User, "articles_count", {author_id: 1})
+        query_cache.invalidate_on_commit(db_sess, "articles", "user_counters")
+        db_article.article_id = article.article_id
+        db_article.update_date = article.update_date
+        return db_article
 
     @staticmethod
-    def delete_article(user_id: int, article_id: int) -> None:
-        with db_session.session_scope() as db_sess:
-            ArticleModelWorker.delete_article_(user_id, article_id, db_sess)
+    async def create_new_articles(
+            db_sess: AsyncSession,
+            articles: List[Tuple[int, CreateArticleData]]
+    ) -> List[Union[ArticleInDB, Exception]]:
+        author_ids = set(await db_sess.scalars(
+            select(User.user_id).where(User.user_id.in_({author_id for author_id, _ in articles}))
+        ))
+        update_date = datetime.now()
+        results = []
+        new_articles = []
+        for author_id, article_data in articles:
+            if author_id not in author_ids:
+                results.append(errors.UserNotFoundError())
+            else:
+                db_article = ArticleInDB(
+                    article_id=-1,
+                    author_id=author_id,
+                    title=article_data.title,
+                    content=article_data.content,
+                    update_date=update_date
+                )
+                results.append(db_article)
+                new_articles.append(db_article)
+        article_ids = await insert_many(
+            db_sess,
+            Article,
+            Article.article_id,
+            [article.dict(exclude={"article_id"}) for article in new_articles]
+        )
+        for article, article_id in zip(new_articles, article_ids):
+            article.article_id = article_id
+        await add_to_counter(db_sess, User, "articles_count", Counter(
+            article.author_id for article in new_articles
+        ))
+        query_cache.invalidate_on_commit(db_sess, "articles", "user_counters")
+        return results
 
     @staticmethod
-    def delete_article_(user_id: int, article_id: int, db_sess) -> None:
-        article = db_sess.query(Article).get(article_id)
+    async def edit_article(
+            db_sess: AsyncSession,
+            user_id: int,
+            article_id: int,
+            article_data: EditArticleData
+    ) -> ArticleInDB:
+        article = await db_sess.get(Article, article_id)
         if not article:
             raise errors.ArticleNotFoundError()
         if article.author_id != user_id:
             raise errors.ForbiddenToUserError()
-        for comment in article.comments:
-            CommentModelWorker.delete_comment_(comment.author_id, comment.comment_id, db_sess)
-        db_sess.delete(article)
+        if article_data.title is not None:
+            article.title = article_data.title
+        if article_data.content is not None:
+            article.content = article_data.content
+        article.update_date = datetime.now()
+        query_cache.invalidate_on_commit(db_sess, "articles")
+        return ArticleModelWorker._sql_article_to_pydantic_article(article)
+
+    @staticmethod
+    async def delete_article(db_sess: AsyncSession, user_id: int, article_id: int) -> None:
+        author_id = await db_sess.scalar(
+            select(Article.author_id).where(Article.article_id == article_id)
+        )
+        if author_id is None:
+            raise errors.ArticleNotFoundError()
+        if author_id != user_id:
+            raise errors.ForbiddenToUserError()
+        article_comments = select(Comment.comment_id).where(Comment.article_id == article_id)
+        for statement in (
+                update(User).where(
+                    User.user_id.in_(article_comments.with_only_columns(Comment.author_id))
+                ).values(comments_count=User.comments_count - select(
+                    func.count(Comment.comment_id)
+                ).where(
+                    Comment.article_id == article_id,
+                    Comment.author_id == User.user_id
+                ).scalar_subquery()),
+                update(User).where(User.user_id == author_id).values(
+                    articles_count=User.articles_count - 1
+                ),
+                delete(Comment).where(Comment.article_id == article_id),
+                delete(Article).where(Article.article_id == article_id)
+        ):
+            await db_sess.execute(statement, execution_options={"synchronize_session": False})
+        query_cache.invalidate_on_commit(db_sess, "articles", "comments", "user_counters")
+
+
+article_group_commit = GroupCommitQueue(
+    ArticleModelWorker.create_new_articles,
+    cst.GROUP_COMMIT_WINDOW_MS,
+    cst.GROUP_COMMIT_MAX_BATCH_SIZE
+) if cst.GROUP_COMMIT_ENABLED else None
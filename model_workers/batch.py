@@ -0,0 +1,14 @@
+from typing import List
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def insert_many(db_sess: AsyncSession, model, id_column, rows: List[dict]) -> List[int]:
+    if not rows:
+        return []
+    await db_sess.execute(insert(model), rows)
+    # Inside one write transaction an executemany insert gets consecutive rowids
+    # ending at the new maximum, so the ids can be recovered without RETURNING.
+    last_id = await db_sess.scalar(select(func.max(id_column)))
+    return list(range(last_id - len(rows) + 1, last_id + 1))
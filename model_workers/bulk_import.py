@@ -0,0 +1,233 @@
+"""Bulk import of users, articles and comments from NDJSON or CSV files.
+
+    python -m model_workers.bulk_import users users.ndjson
+    python -m model_workers.bulk_import articles articles.csv --defer-indexes
+    python -m model_workers.bulk_import comments comments.ndjson --db db/aquahub.db
+
+Rows are validated with the *ImportData models and inserted with executemany,
+one transaction per chunk. Users need either password (hashed here) or an
+already computed hashed_password. Rows referencing unknown users or articles
+are rejected, rows clashing with unique columns are skipped. Import users
+first, then articles, then comments.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple, Type, Union
+
+import sqlalchemy as sa
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+
+from data.articles import Article
+from data.articles_fts import ARTICLES_FTS_DDL
+from data.comments import Comment
+from data.counters import recompute_counters
+from data.storage_profiles import STORAGE_PROFILES
+from data.users import User
+from depends.password_hash import pwd_context
+from models.articles import ArticleImportData
+from models.comments import CommentImportData
+from models.users import UserImportData
+import constants as cst
+
+ENTITIES = {
+    "users": (User, UserImportData),
+    "articles": (Article, ArticleImportData),
+    "comments": (Comment, CommentImportData),
+}
+
+IMPORT_PRAGMAS = [
+    "PRAGMA cache_size = -256000",
+    "PRAGMA temp_store = MEMORY",
+]
+
+MAX_PRINTED_ERRORS = 20
+
+
+def read_records(path: str, file_format: str) -> Iterator[Tuple[int, Union[dict, str]]]:
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            for line_number, record in enumerate(csv.DictReader(file), start=2):
+                yield line_number, {key: value or None for key, value in record.items()}
+        else:
+            # NDJSON lines are decoded in validate, so a malformed line is rejected alone.
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def validate(
+        records: Iterator[Tuple[int, Union[dict, str]]],
+        model: Type[BaseModel],
+        errors: List[str],
+        counts: Dict[str, int]
+) -> Iterator[BaseModel]:
+    for line_number, record in records:
+        counts["read"] += 1
+        try:
+            yield model.parse_raw(record) if isinstance(record, str) else model.parse_obj(record)
+        except ValidationError as error:
+            errors.append(f"line {line_number}: {error.errors()}")
+
+
+def _existing_ids(connection, id_column, ids) -> set:
+    # One JSON parameter instead of thousands of IN placeholders to compile and bind.
+    return set(connection.execute(select(id_column).where(id_column.in_(
+        select(sa.column("value")).select_from(sa.func.json_each(json.dumps(list(ids))))
+    ))).scalars())
+
+
+def prepare_rows(
+        connection,
+        entity: str,
+        items: List[BaseModel],
+        errors: List[str],
+        hasher: ThreadPoolExecutor
+) -> List[dict]:
+    now = datetime.now()
+    if entity == "users":
+        passwords = [item.password for item in items if item.password is not None]
+        hashed = iter(hasher.map(pwd_context.hash, passwords))
+        return [{
+            "user_id": item.user_id,
+            "nickname": item.nickname,
+            "email": item.email,
+            "description": item.description,
+            "registration_date": item.registration_date or now,
+            "hashed_password": item.hashed_password if item.password is None else next(hashed)
+        } for item in items]
+    user_ids = _existing_ids(connection, User.user_id, {item.author_id for item in items})
+    article_ids = _existing_ids(
+        connection, Article.article_id, {item.article_id for item in items}
+    ) if entity == "comments" else set()
+    rows = []
+    for item in items:
+        if item.author_id not in user_ids:
+            errors.append(f"{entity[:-1]} {item.dict()}: unknown author_id {item.author_id}")
+        elif entity == "comments" and item.article_id not in article_ids:
+            errors.append(f"comment {item.dict()}: unknown article_id {item.article_id}")
+        else:
+            rows.append(dict(item.dict(), update_date=item.update_date or now))
+    return rows
+
+
+def _deferred_indexes(table: sa.Table) -> List[sa.Index]:
+    return [index for index in table.indexes if not index.unique]
+
+
+def drop_deferred_indexes(connection, table: sa.Table) -> None:
+    for index in _deferred_indexes(table):
+        index.drop(connection, checkfirst=True)
+    if table.name == "articles":
+        connection.exec_driver_sql("DROP TRIGGER IF EXISTS articles_fts_insert")
+
+
+def build_deferred_indexes(connection, table: sa.Table) -> None:
+    for index in _deferred_indexes(table):
+        index.create(connection, checkfirst=True)
+    if table.name == "articles":
+        connection.exec_driver_sql("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+        for statement in ARTICLES_FTS_DDL:
+            connection.execute(sa.text(statement))
+
+
+def run_import(
+        engine,
+        entity: str,
+        path: str,
+        file_format: str,
+        chunk_size: int,
+        defer_indexes: bool
+) -> List[str]:
+    model, import_model = ENTITIES[entity]
+    table = model.__table__
+    errors = []
+    counts = {"read": 0}
+    inserted = 0
+    started = time.perf_counter()
+    items = validate(read_records(path, file_format), import_model, errors, counts)
+    with engine.connect() as connection, \
+            ThreadPoolExecutor(max_workers=cst.PASSWORD_HASH_WORKERS) as hasher:
+        for pragma in IMPORT_PRAGMAS:
+            connection.exec_driver_sql(pragma)
+        if defer_indexes:
+            with connection.begin():
+                drop_deferred_indexes(connection, table)
+        try:
+            while True:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    break
+                with connection.begin():
+                    rows = prepare_rows(connection, entity, chunk, errors, hasher)
+                    if rows:
+                        inserted += connection.execute(
+                            insert(table).prefix_with("OR IGNORE"), rows
+                        ).rowcount
+        finally:
+            # Rebuilt even if the load fails, the API keeps writing to this database.
+            load_seconds = time.perf_counter() - started
+            if defer_indexes:
+                index_started = time.perf_counter()
+                with connection.begin():
+                    build_deferred_indexes(connection, table)
+                print(f"indexes rebuilt in {time.perf_counter() - index_started:.2f} s")
+        with connection.begin():
+            recompute_counters(connection)
+    total_seconds = time.perf_counter() - started
+    print(
+        f"{entity}: {counts['read']} rows read, {inserted} inserted, {len(errors)} rejected, "
+        f"{counts['read'] - inserted - len(errors)} skipped as duplicates"
+    )
+    print(
+        f"loaded in {load_seconds:.2f} s ({inserted / load_seconds:.0f} rows/s), "
+        f"{total_seconds:.2f} s in total ({inserted / total_seconds:.0f} rows/s)"
+    )
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import NDJSON or CSV data")
+    parser.add_argument("entity", choices=sorted(ENTITIES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default=None)
+    parser.add_argument("--db", default="db/aquahub.db")
+    parser.add_argument("--chunk-size", type=int, default=cst.BULK_IMPORT_CHUNK_SIZE)
+    parser.add_argument(
+        "--defer-indexes", action="store_true",
+        help="drop secondary indexes (and the FTS insert trigger) and rebuild them at the end"
+    )
+    args = parser.parse_args()
+    file_format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    from data.db_session import SqlAlchemyBase
+    from data.migrations import migrate
+    from data import __all_models
+    engine = sa.create_engine(f"sqlite:///{args.db}")
+    profile = STORAGE_PROFILES[cst.DB_STORAGE_PROFILE]
+
+    @sa.event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        for pragma in profile.pragmas():
+            dbapi_connection.execute(pragma)
+
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    errors = run_import(
+        engine, args.entity, args.path, file_format, args.chunk_size, args.defer_indexes
+    )
+    for error in errors[:MAX_PRINTED_ERRORS]:
+        print(error)
+    if len(errors) > MAX_PRINTED_ERRORS:
+        print(f"... and {len(errors) - MAX_PRINTED_ERRORS} more")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,41 @@
+from collections import Counter
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Union, Set, Dict, AsyncIterator
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data.comments import Comment
 from data.users import User
 from data.articles import Article
-from data import db_session
 from depends import errors
 
-from models.comments import CommentInDB, CreateCommentData, EditCommentData
+from models.comments import CommentInDB, CreateCommentData, EditCommentData, \
+    CommentIncludes, CommentExpandedInDB
+from models.users import UserShortOut
+from .batch import insert_many
+from .export import iter_keyset_chunks
+from .counters import add_to_counter
+from .group_commit import GroupCommitQueue
+from .pagination import decode_cursor
+from .query_cache import query_cache
+import constants as cst
+
+
+COMMENT_COLUMNS = (
+    Comment.comment_id,
+    Comment.article_id,
+    Comment.author_id,
+    Comment.content,
+    Comment.update_date
+)
 
 
 class CommentModelWorker:
     @staticmethod
     def _sql_comment_to_pydantic_comment(comment: Comment) -> CommentInDB:
-        return CommentInDB(
+        return CommentInDB.construct(
             comment_id=comment.comment_id,
             article_id=comment.article_id,
             author_id=comment.author_id,
@@ -31,76 +53,255 @@ class CommentModelWorker:
         )
 
     @staticmethod
-    def create_comment(user_id: int, comment_data: CreateCommentData) -> CommentInDB:
-        with db_session.session_scope() as db_sess:
-            user = db_sess.query(User).get(user_id)
-            if not user:
-                raise errors.UserNotFoundError()
-            article = db_sess.query(Article).get(comment_data.article_id)
-            if not article:
-                raise errors.ArticleNotFoundError()
-            db_comment: CommentInDB = CommentInDB(
-                comment_id=-1,
-                article_id=comment_data.article_id,
-                author_id=user_id,
-                content=comment_data.content
+    async def create_comment(
+            db_sess: AsyncSession,
+            user_id: int,
+            comment_data: CreateCommentData
+    ) -> CommentInDB:
+        if comment_group_commit is not None:
+            return await comment_group_commit.submit((user_id, comment_data))
+        user = await db_sess.get(User, user_id)
+        if not user:
+            raise errors.UserNotFoundError()
+        article = await db_sess.get(Article, comment_data.article_id)
+        if not article:
+            raise errors.ArticleNotFoundError()
+        db_comment: CommentInDB = CommentInDB(
+            comment_id=-1,
+            article_id=comment_data.article_id,
+            author_id=user_id,
+            content=comment_data.content
+        )
+        comment = CommentModelWorker._pydantic_comment_to_sql_comment(db_comment)
+        db_sess.add(comment)
+        await db_sess.flush()
+        await add_to_counter(db_sess, Article, "comments_count", {comment.article_id: 1})
+        await add_to_counter(db_sess, User, "comments_count", {user_id: 1})
+        query_cache.invalidate_on_commit(
+            db_sess, "comments", "article_counters", "user_counters"
+        )
+        db_comment.comment_id = comment.comment_id
+        db_comment.update_date = comment.update_date
+        return db_comment
+
+    @staticmethod
+    async def create_comments(
+            db_sess: AsyncSession,
+            comments: List[Tuple[int, CreateCommentData]]
+    ) -> List[Union[CommentInDB, Exception]]:
+        user_ids = set(await db_sess.scalars(
+            select(User.user_id).where(User.user_id.in_({user_id for user_id, _ in comments}))
+        ))
+        article_ids = set(await db_sess.scalars(
+            select(Article.article_id).where(
+                Article.article_id.in_({comment_data.article_id for _, comment_data in comments})
             )
-            comment = CommentModelWorker._pydantic_comment_to_sql_comment(db_comment)
-            db_sess.add(comment)
-            db_sess.commit()
-            db_comment.comment_id = comment.comment_id
-            db_comment.update_date = comment.update_date
-            return db_comment
+        ))
+        update_date = datetime.now()
+        results = []
+        new_comments = []
+        for user_id, comment_data in comments:
+            if user_id not in user_ids:
+                results.append(errors.UserNotFoundError())
+            elif comment_data.article_id not in article_ids:
+                results.append(errors.ArticleNotFoundError())
+            else:
+                db_comment = CommentInDB(
+                    comment_id=-1,
+                    article_id=comment_data.article_id,
+                    author_id=user_id,
+                    content=comment_data.content,
+                    update_date=update_date
+                )
+                results.append(db_comment)
+                new_comments.append(db_comment)
+        comment_ids = await insert_many(
+            db_sess,
+            Comment,
+            Comment.comment_id,
+            [comment.dict(exclude={"comment_id"}) for comment in new_comments]
+        )
+        for comment, comment_id in zip(new_comments, comment_ids):
+            comment.comment_id = comment_id
+        await add_to_counter(db_sess, Article, "comments_count", Counter(
+            comment.article_id for comment in new_comments
+        ))
+        await add_to_counter(db_sess, User, "comments_count", Counter(
+            comment.author_id for comment in new_comments
+        ))
+        query_cache.invalidate_on_commit(
+            db_sess, "comments", "article_counters", "user_counters"
+        )
+        return results
 
     @staticmethod
-    def get_comment(comment_id: int) -> CommentInDB:
-        with db_session.session_scope() as db_sess:
-            comment = db_sess.query(Comment).get(comment_id)
-            if not comment:
-                raise errors.CommentNotFoundError()
-            return CommentModelWorker._sql_comment_to_pydantic_comment(comment)
+    async def get_comment(db_sess: AsyncSession, comment_id: int) -> CommentInDB:
+        comment = await db_sess.get(Comment, comment_id)
+        if not comment:
+            raise errors.CommentNotFoundError()
+        return CommentModelWorker._sql_comment_to_pydantic_comment(comment)
 
     @staticmethod
-    def get_comments(
+    async def get_comment_update_date(
+            db_sess: AsyncSession,
+            comment_id: int
+    ) -> Optional[datetime]:
+        row = (await db_sess.execute(
+            select(Comment.comment_id, Comment.update_date).where(Comment.comment_id == comment_id)
+        )).first()
+        if row is None:
+            raise errors.CommentNotFoundError()
+        return row.update_date
+
+    @staticmethod
+    async def get_comments_by_ids(
+            db_sess: AsyncSession,
+            comment_ids: List[int]
+    ) -> List[Optional[CommentInDB]]:
+        comments = {
+            comment.comment_id: CommentModelWorker._sql_comment_to_pydantic_comment(comment)
+            for comment in await db_sess.scalars(
+                select(Comment).where(Comment.comment_id.in_(set(comment_ids)))
+            )
+        }
+        return [comments.get(comment_id) for comment_id in comment_ids]
+
+    @staticmethod
+    async def get_comments(
+            db_sess: AsyncSession,
             limit: int = 10,
             offset: int = 0,
             author_ids: Optional[List[int]] = None,
-            article_ids: Optional[List[int]] = None
+            article_ids: Optional[List[int]] = None,
+            cursor: Optional[str] = None,
+            include: Optional[Set[CommentIncludes]] = None
+    ) -> List[CommentInDB]:
+        include = frozenset(include or ())
+        entities = ["comments", "users"] if CommentIncludes.AUTHOR in include else ["comments"]
+        key = (
+            "comments", limit, offset,
+            tuple(sorted(set(author_ids))) if author_ids is not None else None,
+            tuple(sorted(set(article_ids))) if article_ids is not None else None,
+            cursor, tuple(sorted(item.value for item in include))
+        )
+        return await query_cache.get_or_load(
+            db_sess, key, entities, lambda: CommentModelWorker._get_comments(
+                db_sess, limit, offset, author_ids, article_ids, cursor, include
+            )
+        )
+
+    @staticmethod
+    async def _get_comments(
+            db_sess: AsyncSession,
+            limit: int,
+            offset: int,
+            author_ids: Optional[List[int]],
+            article_ids: Optional[List[int]],
+            cursor: Optional[str],
+            include: Set[CommentIncludes]
     ) -> List[CommentInDB]:
-        with db_session.session_scope() as db_sess:
-            comments = db_sess.query(Comment)
-            if author_ids is not None:
-                comments = comments.filter(Comment.author_id.in_(author_ids))
-            if article_ids is not None:
-                comments = comments.filter(Comment.article_id.in_(article_ids))
-            comments = comments.limit(limit).offset(offset)
-            return [
-                CommentModelWorker._sql_comment_to_pydantic_comment(comment) for comment in comments
-            ]
+        comments = select(*COMMENT_COLUMNS).order_by(Comment.comment_id)
+        if CommentIncludes.AUTHOR in include:
+            comments = comments.add_columns(User.nickname.label("author_nickname")).join(
+                User, User.user_id == Comment.author_id
+            )
+        if cursor is not None:
+            last_comment_id, = decode_cursor(cursor)
+            comments = comments.where(Comment.comment_id > last_comment_id)
+        if author_ids is not None:
+            comments = comments.where(Comment.author_id.in_(author_ids))
+        if article_ids is not None:
+            comments = comments.where(Comment.article_id.in_(article_ids))
+        rows = (await db_sess.execute(comments.limit(limit).offset(offset))).all()
+        if not include:
+            return [CommentInDB.construct(**row._mapping) for row in rows]
+        expanded_comments = []
+        for row in rows:
+            comment = dict(row._mapping)
+            comment["author"] = UserShortOut.construct(
+                user_id=row.author_id,
+                nickname=comment.pop("author_nickname")
+            )
+            expanded_comments.append(CommentExpandedInDB.construct(**comment))
+        return expanded_comments
 
     @staticmethod
-    def edit_comment(user_id: int, comment_id: int, comment_data: EditCommentData) -> CommentInDB:
-        with db_session.session_scope() as db_sess:
-            comment = db_sess.query(Comment).get(comment_id)
-            if not comment:
-                raise errors.CommentNotFoundError()
-            if comment.author_id != user_id:
-                raise errors.ForbiddenToUserError()
-            if comment_data.content is not None:
-                comment.content = comment_data.content
-            comment.update_date = datetime.now()
-            return CommentModelWorker._sql_comment_to_pydantic_comment(comment)
+    async def export_comments(
+            author_ids: Optional[List[int]] = None,
+            article_ids: Optional[List[int]] = None,
+            chunk_size: int = cst.EXPORT_CHUNK_SIZE
+    ) -> AsyncIterator[List[CommentInDB]]:
+        comments = select(*COMMENT_COLUMNS)
+        if author_ids is not None:
+            comments = comments.where(Comment.author_id.in_(author_ids))
+        if article_ids is not None:
+            comments = comments.where(Comment.article_id.in_(article_ids))
+        async for rows in iter_keyset_chunks(comments, Comment.comment_id, chunk_size):
+            yield [CommentInDB.construct(**row._mapping) for row in rows]
 
     @staticmethod
-    def delete_comment(user_id: int, comment_id: int) -> None:
-        with db_session.session_scope() as db_sess:
-            CommentModelWorker.delete_comment_(user_id, comment_id, db_sess)
+    async def get_latest_comments(
+            db_sess: AsyncSession,
+            article_ids: List[int],
+            count: int = cst.LATEST_COMMENTS_COUNT
+    ) -> Dict[int, List[CommentInDB]]:
+        latest_comments = {article_id: [] for article_id in article_ids}
+        if not article_ids:
+            return latest_comments
+        ranked = select(
+            Comment,
+            func.row_number().over(
+                partition_by=Comment.article_id,
+                order_by=Comment.comment_id.desc()
+            ).label("position")
+        ).where(Comment.article_id.in_(article_ids)).subquery()
+        ranked_comment = aliased(Comment, ranked)
+        comments = await db_sess.scalars(
+            select(ranked_comment).where(ranked.c.position <= count).order_by(
+                ranked.c.article_id, ranked.c.comment_id.desc()
+            )
+        )
+        for comment in comments:
+            latest_comments[comment.article_id].append(
+                CommentModelWorker._sql_comment_to_pydantic_comment(comment)
+            )
+        return latest_comments
 
     @staticmethod
-    def delete_comment_(user_id: int, comment_id: int, db_sess) -> None:
-        comment = db_sess.query(Comment).get(comment_id)
+    async def edit_comment(
+            db_sess: AsyncSession,
+            user_id: int,
+            comment_id: int,
+            comment_data: EditCommentData
+    ) -> CommentInDB:
+        comment = await db_sess.get(Comment, comment_id)
         if not comment:
             raise errors.CommentNotFoundError()
         if comment.author_id != user_id:
             raise errors.ForbiddenToUserError()
-        db_sess.delete(comment)
+        if comment_data.content is not None:
+            comment.content = comment_data.content
+        comment.update_date = datetime.now()
+        query_cache.invalidate_on_commit(db_sess, "comments")
+        return CommentModelWorker._sql_comment_to_pydantic_comment(comment)
+
+    @staticmethod
+    async def delete_comment(db_sess: AsyncSession, user_id: int, comment_id: int) -> None:
+        comment = await db_sess.get(Comment, comment_id)
+        if not comment:
+            raise errors.CommentNotFoundError()
+        if comment.author_id != user_id:
+            raise errors.ForbiddenToUserError()
+        await db_sess.delete(comment)
+        await add_to_counter(db_sess, Article, "comments_count", {comment.article_id: -1})
+        await add_to_counter(db_sess, User, "comments_count", {comment.author_id: -1})
+        query_cache.invalidate_on_commit(
+            db_sess, "comments", "article_counters", "user_counters"
+        )
+
+
+comment_group_commit = GroupCommitQueue(
+    CommentModelWorker.create_comments,
+    cst.GROUP_COMMIT_WINDOW_MS,
+    cst.GROUP_COMMIT_MAX_BATCH_SIZE
+) if cst.GROUP_COMMIT_ENABLED else None
@@ -0,0 +1,24 @@
+from typing import Dict
+
+from sqlalchemy import update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def add_to_counter(
+        db_sess: AsyncSession,
+        model,
+        counter: str,
+        deltas: Dict[int, int]
+) -> None:
+    deltas = {row_id: delta for row_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    table = model.__table__
+    primary_key, = table.primary_key.columns
+    column = table.c[counter]
+    await db_sess.execute(
+        update(table).where(primary_key == bindparam("counter_row_id")).values(
+            {counter: column + bindparam("counter_delta")}
+        ),
+        [{"counter_row_id": row_id, "counter_delta": delta} for row_id, delta in deltas.items()]
+    )
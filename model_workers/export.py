@@ -0,0 +1,37 @@
+from typing import AsyncIterator, List
+
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Select
+
+from data import db_session
+from data.sql_instrumentation import REPEATS_EXPECTED
+from depends.fast_json import dumps
+
+
+async def iter_keyset_chunks(
+        statement: Select,
+        id_column,
+        chunk_size: int
+) -> AsyncIterator[List[Row]]:
+    # Every chunk is read in its own short read-only session, so an export of any
+    # size never holds a read transaction (and the WAL checkpoint) open for long.
+    last_id = None
+    while True:
+        chunk_statement = statement.order_by(id_column).limit(chunk_size).execution_options(
+            **{REPEATS_EXPECTED: True}
+        )
+        if last_id is not None:
+            chunk_statement = chunk_statement.where(id_column > last_id)
+        async with db_session.async_session_scope(read_only=True) as db_sess:
+            rows = (await db_sess.execute(chunk_statement)).all()
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1]._mapping[id_column.key]
+
+
+async def ndjson_stream(chunks: AsyncIterator[List[BaseModel]]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield b"".join(dumps(item) + b"\n" for item in chunk)
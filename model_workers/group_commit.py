@@ -0,0 +1,58 @@
+import asyncio
+from typing import Awaitable, Callable, List, Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from data import db_session
+
+
+class GroupCommitQueue:
+    def __init__(
+            self,
+            flush: Callable[[AsyncSession, List[Any]], Awaitable[List[Any]]],
+            window_ms: float,
+            max_batch_size: int
+    ):
+        self._flush = flush
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._items = []
+        self._timer = None
+        self._tasks = set()
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((item, future))
+        if len(self._items) >= self.max_batch_size:
+            self._start_batch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_batch)
+        return await future
+
+    def _start_batch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            task = asyncio.ensure_future(self._commit(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _commit(self, items) -> None:
+        try:
+            async with db_session.async_session_scope() as db_sess:
+                results = await self._flush(db_sess, [item for item, _ in items])
+        except Exception as error:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(items, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
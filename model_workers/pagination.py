@@ -0,0 +1,24 @@
+import base64
+import binascii
+import json
+from typing import List
+
+from depends import errors
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: int) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 1) -> List[int]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise errors.InvalidCursorError()
+    if not isinstance(values, list) or len(values) != size or \
+            not all(isinstance(value, int) for value in values):
+        raise errors.InvalidCursorError()
+    return values
@@ -0,0 +1,128 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from data import db_session
+import constants as cst
+
+MISSING = object()
+
+
+def _estimate_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, BaseModel):
+        value = value.__dict__
+    if isinstance(value, dict):
+        size += sum(_estimate_size(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+
+class QueryCache:
+    def __init__(self, enabled: bool, ttl: float, max_entries: int, max_bytes: int):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], float, Any, int]]" = \
+            OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def generations(self, entities: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(entity, 0) for entity in entities)
+
+    def bump(self, *entities: str) -> None:
+        for entity in entities:
+            self._generations[entity] = self._generations.get(entity, 0) + 1
+
+    def invalidate_on_commit(self, db_sess: AsyncSession, *entities: str) -> None:
+        db_session.on_commit(db_sess, lambda: self.bump(*entities))
+
+    def _remove(self, key: Hashable) -> None:
+        self._bytes -= self._entries.pop(key)[3]
+
+    def get(self, key: Hashable, generations: Tuple[int, ...]):
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return MISSING
+        entry_generations, expires_at, value, _ = entry
+        if entry_generations != generations:
+            self._invalidations += 1
+        elif expires_at < time.monotonic():
+            self._expirations += 1
+        else:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+        self._remove(key)
+        self._misses += 1
+        return MISSING
+
+    def set(self, key: Hashable, generations: Tuple[int, ...], value) -> None:
+        if key in self._entries:
+            self._remove(key)
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        while self._entries and (
+                len(self._entries) >= self.max_entries or self._bytes + size > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+        self._entries[key] = (generations, time.monotonic() + self.ttl, value, size)
+        self._bytes += size
+
+    async def get_or_load(
+            self,
+            db_sess: AsyncSession,
+            key: Hashable,
+            entities: Iterable[str],
+            load: Callable[[], Awaitable[list]]
+    ) -> list:
+        # The generations have to be read before the read transaction starts, otherwise
+        # a write committed in between could be cached under its own new generation.
+        if not self.enabled or db_sess.in_transaction():
+            return await load()
+        generations = self.generations(entities)
+        value = self.get(key, generations)
+        if value is MISSING:
+            value = await load()
+            self.set(key, generations, value)
+        return list(value)
+
+    def stats(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "invalidations": self._invalidations,
+            "generations": dict(self._generations)
+        }
+
+
+query_cache = QueryCache(
+    enabled=cst.QUERY_CACHE_ENABLED,
+    ttl=cst.QUERY_CACHE_TTL_SECONDS,
+    max_entries=cst.QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=cst.QUERY_CACHE_MAX_BYTES
+)
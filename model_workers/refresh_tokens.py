@@ -0,0 +1,73 @@
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from data.refresh_tokens import RefreshToken
+from data.users import User
+from depends import errors
+from models.tokens import TokenData
+import constants as cst
+import jwt_key
+
+
+def _hash_token(token: str) -> str:
+    # Refresh tokens are random and long, so a keyed HMAC is enough here: no bcrypt
+    # on refresh, and a leaked table can't be replayed without the secret key.
+    return hmac.new(jwt_key.SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+class RefreshTokenModelWorker:
+    @staticmethod
+    async def create_refresh_token(db_sess: AsyncSession, user_id: int) -> str:
+        now = datetime.now()
+        await db_sess.execute(delete(RefreshToken).where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.expires_at <= now
+        ))
+        token = secrets.token_urlsafe(cst.REFRESH_TOKEN_BYTES)
+        db_sess.add(RefreshToken(
+            user_id=user_id,
+            token_hash=_hash_token(token),
+            created_at=now,
+            expires_at=now + timedelta(days=cst.REFRESH_TOKEN_EXPIRE_DAYS)
+        ))
+        await db_sess.flush()
+        return token
+
+    @staticmethod
+    async def rotate_refresh_token(db_sess: AsyncSession, token: str) -> Tuple[TokenData, str]:
+        row = (await db_sess.execute(
+            select(
+                RefreshToken.token_id,
+                RefreshToken.expires_at,
+                User.user_id,
+                User.nickname,
+                User.token_version
+            ).join(User, User.user_id == RefreshToken.user_id).where(
+                RefreshToken.token_hash == _hash_token(token)
+            )
+        )).first()
+        if row is None or row.expires_at <= datetime.now():
+            raise errors.InvalidRefreshTokenError()
+        # Every refresh token is single use: a concurrent refresh with the same token
+        # finds nothing to delete and fails.
+        deleted = await db_sess.execute(
+            delete(RefreshToken).where(RefreshToken.token_id == row.token_id)
+        )
+        if deleted.rowcount != 1:
+            raise errors.InvalidRefreshTokenError()
+        user = TokenData(
+            user_id=row.user_id,
+            nickname=row.nickname,
+            token_version=row.token_version
+        )
+        return user, await RefreshTokenModelWorker.create_refresh_token(db_sess, row.user_id)
+
+    @staticmethod
+    async def revoke_user_tokens(db_sess: AsyncSession, user_id: int) -> None:
+        await db_sess.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
@@ -1,27 +1,51 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, AsyncIterator, Set
+
+from sqlalchemy import select, delete, update, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data import db_session
 from data.users import User
+from data.articles import Article
+from data.comments import Comment
 
 from depends.password_hash import get_password_hash
+from depends.token_versions import token_versions
 from depends import errors
 
-from models.users import UserInDB, UserRegistrationData, UserEditData, SearchByNicknameMode
-from .articles import ArticleModelWorker
-from .comments import CommentModelWorker
+from models.users import UserInDB, UserRegistrationData, UserEditData, SearchByNicknameMode, \
+    UserOrder, UserOut, UserField
+from .export import iter_keyset_chunks
+from .pagination import decode_cursor
+from .query_cache import query_cache
+from .refresh_tokens import RefreshTokenModelWorker
+import constants as cst
+
+
+USER_COLUMNS = (
+    User.user_id,
+    User.nickname,
+    User.description,
+    User.registration_date,
+    User.articles_count,
+    User.comments_count
+)
+USER_COUNTER_FIELDS = frozenset(("articles_count", "comments_count"))
 
 
 class UserModelWorker:
     @staticmethod
     def _sql_user_to_pydantic_user(user: User) -> UserInDB:
-        return UserInDB(
+        return UserInDB.construct(
             user_id=user.user_id,
             nickname=user.nickname,
             description=user.description,
             registration_date=user.registration_date,
             email=user.email,
-            hashed_password=user.hashed_password
+            hashed_password=user.hashed_password,
+            token_version=user.token_version,
+            articles_count=user.articles_count,
+            comments_count=user.comments_count
         )
 
     @staticmethod
@@ -37,96 +61,204 @@ class UserModelWorker:
         )
 
     @staticmethod
-    def get_user(user_id: int) -> UserInDB:
-        with db_session.session_scope() as db_sess:
-            user = db_sess.query(User).get(user_id)
-            if not user:
-                raise errors.UserNotFoundError()
-            return UserModelWorker._sql_user_to_pydantic_user(user)
+    async def get_user(db_sess: AsyncSession, user_id: int) -> UserInDB:
+        user = await db_sess.get(User, user_id)
+        if not user:
+            raise errors.UserNotFoundError()
+        return UserModelWorker._sql_user_to_pydantic_user(user)
 
     @staticmethod
-    def get_user_by_nickname(nickname: str) -> UserInDB:
-        with db_session.session_scope() as db_sess:
-            user = db_sess.query(User).filter(User.nickname == nickname).first()
-            if not user:
-                raise errors.UserNotFoundError()
-            return UserModelWorker._sql_user_to_pydantic_user(user)
+    async def get_users_by_ids(
+            db_sess: AsyncSession,
+            user_ids: List[int]
+    ) -> List[Optional[UserInDB]]:
+        users = {
+            user.user_id: UserModelWorker._sql_user_to_pydantic_user(user)
+            for user in await db_sess.scalars(select(User).where(User.user_id.in_(set(user_ids))))
+        }
+        return [users.get(user_id) for user_id in user_ids]
+
+    @staticmethod
+    async def get_user_by_nickname(db_sess: AsyncSession, nickname: str) -> UserInDB:
+        user = await db_sess.scalar(select(User).where(User.nickname == nickname))
+        if not user:
+            raise errors.UserNotFoundError()
+        return UserModelWorker._sql_user_to_pydantic_user(user)
+
+    @staticmethod
+    async def get_token_version(db_sess: AsyncSession, user_id: int) -> Optional[int]:
+        return await db_sess.scalar(
+            select(User.token_version).where(User.user_id == user_id)
+        )
 
     @staticmethod
-    def get_users(
+    async def get_users(
+            db_sess: AsyncSession,
             limit: int = 10,
             offset: int = 0,
             nickname_search_substring: Optional[str] = None,
-            search_mode: SearchByNicknameMode = SearchByNicknameMode.STARTSWITH
-    ) -> List[UserInDB]:
-        with db_session.session_scope() as db_sess:
-            users = db_sess.query(User)
-            if nickname_search_substring is not None:
-                if search_mode == SearchByNicknameMode.STARTSWITH:
-                    users = users.filter(User.nickname.startswith(nickname_search_substring))
-                elif search_mode == SearchByNicknameMode.EQUALS:
-                    users = users.filter(User.nickname == nickname_search_substring)
-                elif search_mode == SearchByNicknameMode.EQUALS_CASE_INSENSITIVE:
-                    users = users.filter(User.nickname.like(nickname_search_substring))
-                else:
-                    print(f"Unknown nickname search mode: {search_mode}")
-            users = users.limit(limit).offset(offset)
-            return [UserModelWorker._sql_user_to_pydantic_user(user) for user in users]
+            search_mode: SearchByNicknameMode = SearchByNicknameMode.STARTSWITH,
+            cursor: Optional[str] = None,
+            order: UserOrder = UserOrder.ID,
+            fields: Optional[Set[UserField]] = None
+    ) -> List[UserOut]:
+        fields = frozenset(field.value for field in fields) if fields else None
+        key = (
+            "users", limit, offset, nickname_search_substring,
+            search_mode.value if nickname_search_substring is not None else None,
+            cursor, order.value, tuple(sorted(fields)) if fields is not None else None
+        )
+        entities = ["users"]
+        if fields is None or order != UserOrder.ID or not fields.isdisjoint(USER_COUNTER_FIELDS):
+            entities.append("user_counters")
+        return await query_cache.get_or_load(
+            db_sess, key, entities, lambda: UserModelWorker._get_users(
+                db_sess, limit, offset, nickname_search_substring, search_mode, cursor, order,
+                fields
+            )
+        )
 
     @staticmethod
-    def create_new_user(user_data: UserRegistrationData) -> UserInDB:
-        with db_session.session_scope() as db_sess:
-            if db_sess.query(User).filter(User.nickname == user_data.nickname).first():
-                raise errors.NicknameAlreadyUseError()
-            if db_sess.query(User).filter(User.email == user_data.email).first():
-                raise errors.EmailAlreadyUseError()
-            db_user = UserInDB(
-                user_id=-1,
-                nickname=user_data.nickname,
-                description=user_data.description,
-                registration_date=None,
-                email=user_data.email,
-                hashed_password=get_password_hash(user_data.password)
-            )
-            user: User = UserModelWorker._pydantic_user_to_sql_user(db_user)
-            db_sess.add(user)
-            db_sess.commit()
-            db_user.user_id = user.user_id
-            db_user.registration_date = user.registration_date
-            return db_user
+    async def _get_users(
+            db_sess: AsyncSession,
+            limit: int,
+            offset: int,
+            nickname_search_substring: Optional[str],
+            search_mode: SearchByNicknameMode,
+            cursor: Optional[str],
+            order: UserOrder,
+            fields: Optional[Set[str]]
+    ) -> List[UserOut]:
+        # Only public columns are ever selected. user_id and the ordering counter stay in
+        # the projection because the next cursor is built from them.
+        users = select(*(
+            column for column in USER_COLUMNS
+            if fields is None or column.key in fields or column.key in ("user_id", order.value)
+        ))
+        if order == UserOrder.ID:
+            users = users.order_by(User.user_id)
+            if cursor is not None:
+                last_user_id, = decode_cursor(cursor)
+                users = users.where(User.user_id > last_user_id)
+        else:
+            counter = getattr(User, order.value)
+            users = users.order_by(counter.desc(), User.user_id.desc())
+            if cursor is not None:
+                last_count, last_user_id = decode_cursor(cursor, 2)
+                users = users.where(
+                    tuple_(counter, User.user_id) < tuple_(last_count, last_user_id)
+                )
+        if nickname_search_substring is not None:
+            if search_mode == SearchByNicknameMode.STARTSWITH:
+                users = users.where(User.nickname.startswith(nickname_search_substring))
+            elif search_mode == SearchByNicknameMode.EQUALS:
+                users = users.where(User.nickname == nickname_search_substring)
+            elif search_mode == SearchByNicknameMode.EQUALS_CASE_INSENSITIVE:
+                users = users.where(User.nickname.like(nickname_search_substring))
+            else:
+                print(f"Unknown nickname search mode: {search_mode}")
+        rows = await db_sess.execute(users.limit(limit).offset(offset))
+        return [UserOut.construct(**row._mapping) for row in rows]
 
     @staticmethod
-    def edit_user(user_id: int, user_data: UserEditData) -> UserInDB:
-        with db_session.session_scope() as db_sess:
-            user = db_sess.query(User).get(user_id)
-            if not user:
-                raise errors.UserNotFoundError()
-            if user_data.email is not None:
-                if db_sess.query(User).filter(
-                        User.user_id != user_id,
-                        User.email == user_data.email
-                ).first():
-                    raise errors.EmailAlreadyUseError()
-                user.email = user_data.email
-            if user_data.password is not None:
-                user.hashed_password = get_password_hash(user_data.password)
-            if user_data.description is not None:
-                user.description = user_data.description
-            result: UserInDB = UserModelWorker._sql_user_to_pydantic_user(user)
-            return result
+    async def export_users(chunk_size: int = cst.EXPORT_CHUNK_SIZE) -> AsyncIterator[List[UserOut]]:
+        async for rows in iter_keyset_chunks(select(*USER_COLUMNS), User.user_id, chunk_size):
+            yield [UserOut.construct(**row._mapping) for row in rows]
 
     @staticmethod
-    def delete_user(user_id) -> None:
-        with db_session.session_scope() as db_sess:
-            UserModelWorker.delete_user_(user_id, db_sess)
+    async def create_new_user(
+            db_sess: AsyncSession,
+            user_data: UserRegistrationData
+    ) -> UserInDB:
+        hashed_password = await get_password_hash(user_data.password)
+        if await db_sess.scalar(select(User).where(User.nickname == user_data.nickname)):
+            raise errors.NicknameAlreadyUseError()
+        if await db_sess.scalar(select(User).where(User.email == user_data.email)):
+            raise errors.EmailAlreadyUseError()
+        db_user = UserInDB(
+            user_id=-1,
+            nickname=user_data.nickname,
+            description=user_data.description,
+            registration_date=None,
+            email=user_data.email,
+            hashed_password=hashed_password
+        )
+        user: User = UserModelWorker._pydantic_user_to_sql_user(db_user)
+        db_sess.add(user)
+        await db_sess.flush()
+        query_cache.invalidate_on_commit(db_sess, "users")
+        user_id, token_version = user.user_id, user.token_version
+        # Replaces whatever this process remembers about the id, e.g. a revoked entry.
+        db_session.on_commit(
+            db_sess, lambda: token_versions.set_version(user_id, token_version)
+        )
+        db_user.user_id = user.user_id
+        db_user.registration_date = user.registration_date
+        return db_user
 
     @staticmethod
-    def delete_user_(user_id, db_sess) -> None:
-        user = db_sess.query(User).get(user_id)
+    async def edit_user(
+            db_sess: AsyncSession,
+            user_id: int,
+            user_data: UserEditData
+    ) -> UserInDB:
+        hashed_password = None
+        if user_data.password is not None:
+            hashed_password = await get_password_hash(user_data.password)
+        user = await db_sess.get(User, user_id)
         if not user:
             raise errors.UserNotFoundError()
-        for article in user.articles:
-            ArticleModelWorker.delete_article_(article.author_id, article.article_id, db_sess)
-        for comment in user.comments:
-            CommentModelWorker.delete_comment_(comment.author_id, comment.comment_id, db_sess)
-        db_sess.delete(user)
+        if user_data.email is not None:
+            if await db_sess.scalar(select(User).where(
+                    User.user_id != user_id,
+                    User.email == user_data.email
+            )):
+                raise errors.EmailAlreadyUseError()
+            user.email = user_data.email
+        if hashed_password is not None:
+            user.hashed_password = hashed_password
+            user.token_version += 1
+            await RefreshTokenModelWorker.revoke_user_tokens(db_sess, user_id)
+        if user_data.description is not None:
+            user.description = user_data.description
+        result: UserInDB = UserModelWorker._sql_user_to_pydantic_user(user)
+        query_cache.invalidate_on_commit(db_sess, "users")
+        if hashed_password is not None:
+            db_session.on_commit(
+                db_sess, lambda: token_versions.set_version(user_id, result.token_version)
+            )
+        return result
+
+    @staticmethod
+    async def delete_user(db_sess: AsyncSession, user_id) -> None:
+        if await db_sess.scalar(select(User.user_id).where(User.user_id == user_id)) is None:
+            raise errors.UserNotFoundError()
+        await RefreshTokenModelWorker.revoke_user_tokens(db_sess, user_id)
+        user_articles = select(Article.article_id).where(Article.author_id == user_id)
+        for statement in (
+                update(User).where(User.user_id.in_(
+                    select(Comment.author_id).where(Comment.article_id.in_(user_articles))
+                )).values(comments_count=User.comments_count - select(
+                    func.count(Comment.comment_id)
+                ).where(
+                    Comment.article_id.in_(user_articles),
+                    Comment.author_id == User.user_id
+                ).scalar_subquery()),
+                update(Article).where(Article.article_id.in_(
+                    select(Comment.article_id).where(Comment.author_id == user_id)
+                )).values(comments_count=Article.comments_count - select(
+                    func.count(Comment.comment_id)
+                ).where(
+                    Comment.author_id == user_id,
+                    Comment.article_id == Article.article_id
+                ).scalar_subquery()),
+                delete(Comment).where(Comment.article_id.in_(user_articles)),
+                delete(Comment).where(Comment.author_id == user_id),
+                delete(Article).where(Article.author_id == user_id),
+                delete(User).where(User.user_id == user_id)
+        ):
+            await db_sess.execute(statement, execution_options={"synchronize_session": False})
+        db_session.on_commit(db_sess, lambda: token_versions.revoke(user_id))
+        query_cache.invalidate_on_commit(
+            db_sess, "users", "articles", "comments", "article_counters", "user_counters"
+        )
@@ -1,9 +1,11 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, conlist
 
+from models.comments import CommentInDB
+from models.users import UserShortOut
 import constants as cst
 
 
@@ -12,6 +14,26 @@ class SearchByTitleModes(str, Enum):
     STARTSWITH = "start"
     EQUALS = "equ"
     EQUALS_CASE_INSENSITIVE = "equ_ci"
+    FULL_TEXT = "fts"
+
+
+class ArticleOrder(str, Enum):
+    ID = "id"
+    COMMENTS_COUNT = "comments_count"
+
+
+class ArticleIncludes(str, Enum):
+    AUTHOR = "author"
+    COMMENTS_COUNT = "comments_count"
+    LATEST_COMMENTS = "latest_comments"
+
+
+class ArticleField(str, Enum):
+    ARTICLE_ID = "article_id"
+    AUTHOR_ID = "author_id"
+    TITLE = "title"
+    CONTENT = "content"
+    UPDATE_DATE = "update_date"
 
 
 class Article(BaseModel):
@@ -29,6 +51,26 @@ class ArticleOut(ArticleInDB):
     pass
 
 
+class ArticleExpandedInDB(ArticleInDB):
+    author: Optional[UserShortOut]
+    comments_count: Optional[int]
+    latest_comments: Optional[List[CommentInDB]]
+
+
+class ArticleExpandedOut(ArticleExpandedInDB):
+    pass
+
+
+class ArticleSearchResult(ArticleOut):
+    snippet: Optional[str]
+    rank: float
+
+
+class ArticleImportData(Article):
+    article_id: Optional[int]
+    update_date: Optional[datetime]
+
+
 class CreateArticleData(BaseModel):
     title: str = Field(..., max_length=cst.ARTICLE_TITLE_MAX_LENGTH)
     content: Optional[str] = Field(None, max_length=cst.ARTICLE_CONTENT_MAX_LENGTH)
@@ -37,3 +79,19 @@ class CreateArticleData(BaseModel):
 class EditArticleData(BaseModel):
     title: Optional[str] = Field(None, max_length=cst.ARTICLE_TITLE_MAX_LENGTH)
     content: Optional[str] = Field(None, max_length=cst.ARTICLE_CONTENT_MAX_LENGTH)
+
+
+CreateArticlesBatchData = conlist(CreateArticleData, min_items=1, max_items=cst.BATCH_MAX_SIZE)
+
+
+class ArticleBatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    article: Optional[ArticleOut]
+    detail: Optional[str]
+
+
+class ArticleLookupResult(BaseModel):
+    article_id: int
+    found: bool
+    article: Optional[ArticleOut]
@@ -1,9 +1,15 @@
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from enum import Enum
+from pydantic import BaseModel, Field, conlist
+from models.users import UserShortOut
 import constants as cst
 
 
+class CommentIncludes(str, Enum):
+    AUTHOR = "author"
+
+
 class Comment(BaseModel):
     article_id: int
     author_id: int
@@ -19,6 +25,19 @@ class CommentOut(CommentInDB):
     pass
 
 
+class CommentExpandedInDB(CommentInDB):
+    author: Optional[UserShortOut]
+
+
+class CommentExpandedOut(CommentExpandedInDB):
+    pass
+
+
+class CommentImportData(Comment):
+    comment_id: Optional[int]
+    update_date: Optional[datetime]
+
+
 class CreateCommentData(BaseModel):
     article_id: int
     content: Optional[str] = Field(None, max_length=cst.COMMENT_CONTENT_MAX_LENGTH)
@@ -26,3 +45,19 @@ class CreateCommentData(BaseModel):
 
 class EditCommentData(BaseModel):
     content: Optional[str] = Field(None, max_length=cst.COMMENT_CONTENT_MAX_LENGTH)
+
+
+CreateCommentsBatchData = conlist(CreateCommentData, min_items=1, max_items=cst.BATCH_MAX_SIZE)
+
+
+class CommentBatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    comment: Optional[CommentOut]
+    detail: Optional[str]
+
+
+class CommentLookupResult(BaseModel):
+    comment_id: int
+    found: bool
+    comment: Optional[CommentOut]
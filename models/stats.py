@@ -0,0 +1,45 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class PasswordHashStats(BaseModel):
+    executor: str
+    workers: int
+    max_queue: int
+    queue_depth: int
+    in_flight: int
+    completed: int
+    rejected: int
+    timed_out: int
+    avg_hash_ms: float
+    max_hash_ms: float
+    avg_wait_ms: float
+
+
+class DbPoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+
+
+class DbPoolsStats(BaseModel):
+    writer: DbPoolStats
+    reader: DbPoolStats
+
+
+class QueryCacheStats(BaseModel):
+    enabled: bool
+    entries: int
+    max_entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    expirations: int
+    invalidations: int
+    generations: Dict[str, int]
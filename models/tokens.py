@@ -1,11 +1,19 @@
 from typing import Optional
-from pydantic import BaseModel
+
+from pydantic import BaseModel, Field
 
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
 
 
 class TokenData(BaseModel):
-    nickname: Optional[str]
+    user_id: int
+    nickname: str
+    token_version: int
+
+
+class RefreshTokenData(BaseModel):
+    refresh_token: str = Field(..., max_length=128)
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, root_validator
 
 import constants as cst
 
@@ -10,6 +10,21 @@ EMAIL_REGEX = r"^\w+@\w+\.\w+$"
 NICKNAME_REGEX = r"^\w+$"
 
 
+class UserOrder(str, Enum):
+    ID = "id"
+    ARTICLES_COUNT = "articles_count"
+    COMMENTS_COUNT = "comments_count"
+
+
+class UserField(str, Enum):
+    USER_ID = "user_id"
+    NICKNAME = "nickname"
+    DESCRIPTION = "description"
+    REGISTRATION_DATE = "registration_date"
+    ARTICLES_COUNT = "articles_count"
+    COMMENTS_COUNT = "comments_count"
+
+
 class SearchByNicknameMode(str, Enum):
     STARTSWITH = "start"
     EQUALS = "equ"
@@ -30,7 +45,13 @@ class UserWithRegistrationDate(User):
 
 
 class UserOut(UserWithId, UserWithRegistrationDate):
-    pass
+    articles_count: int = 0
+    comments_count: int = 0
+
+
+class UserShortOut(BaseModel):
+    user_id: int
+    nickname: str
 
 
 class UserMeOut(UserOut):
@@ -39,6 +60,9 @@ class UserMeOut(UserOut):
 
 class UserInDB(UserWithId, UserWithRegistrationDate):
     hashed_password: str
+    token_version: int = 0
+    articles_count: int = 0
+    comments_count: int = 0
     email: str = Field(..., max_length=64, regex=EMAIL_REGEX)
 
 
@@ -63,6 +87,30 @@ class UserEditData(BaseModel):
     )
 
 
+class UserImportData(User):
+    user_id: Optional[int]
+    email: str = Field(..., max_length=64, regex=EMAIL_REGEX)
+    registration_date: Optional[datetime]
+    password: Optional[str] = Field(
+        None,
+        min_length=cst.PASSWORD_MIN_LENGTH,
+        max_length=cst.PASSWORD_MAX_LENGTH
+    )
+    hashed_password: Optional[str] = Field(None, max_length=512)
+
+    @root_validator(skip_on_failure=True)
+    def check_password(cls, values):
+        if (values["password"] is None) == (values["hashed_password"] is None):
+            raise ValueError("exactly one of password and hashed_password is required")
+        return values
+
+
 class UserLoginData(BaseModel):
     nickname: str = Field(..., min_length=3, max_length=64, regex=NICKNAME_REGEX)
     password: str = Field(..., max_length=cst.PASSWORD_MAX_LENGTH)
+
+
+class UserLookupResult(BaseModel):
+    user_id: int
+    found: bool
+    user: Optional[UserOut]
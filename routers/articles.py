@@ -1,11 +1,25 @@
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, List, Set
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from model_workers.articles import ArticleModelWorker
+from model_workers.export import ndjson_stream
+from model_workers.pagination import encode_cursor, NEXT_CURSOR_HEADER
 from models.articles import ArticleOut, CreateArticleData, ArticleInDB, \
-    SearchByTitleModes, EditArticleData
-from models.users import UserInDB
+    SearchByTitleModes, EditArticleData, ArticleSearchResult, \
+    CreateArticlesBatchData, ArticleBatchItemResult, ArticleLookupResult, \
+    ArticleIncludes, ArticleExpandedOut, ArticleOrder, ArticleField
+from models.tokens import TokenData
 from depends.get_current_user import get_current_user
+from depends.get_db import get_db, get_read_db
+from depends.get_include import get_include
+from depends.get_fields import get_fields
+from depends.rate_limit import rate_limit, check_rate_limit
+from depends.conditional_get import make_etag, has_conditional_headers, is_not_modified, \
+    set_validators, not_modified
+from depends.fast_json import fast_json_response
 from depends import errors
+import constants as cst
 
 router = APIRouter(
     prefix="/articles",
@@ -14,13 +28,21 @@ router = APIRouter(
 )
 
 
-@router.post("/", status_code=201, response_model=ArticleOut)
+@router.post(
+    "/",
+    status_code=201,
+    response_model=ArticleOut,
+    dependencies=[Depends(rate_limit("create_article"))]
+)
 async def create_article(
         article_data: CreateArticleData,
-        current_user: UserInDB = Depends(get_current_user)
+        response: Response,
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        article: ArticleInDB = ArticleModelWorker.create_new_article(
+        article: ArticleInDB = await ArticleModelWorker.create_new_article(
+            db_sess,
             current_user.user_id, article_data
         )
     except errors.UserNotFoundError:
@@ -28,52 +50,156 @@ async def create_article(
             status_code=404,
             detail="User not found"
         )
-    return ArticleOut(
-        article_id=article.article_id,
-        author_id=article.author_id,
-        title=article.title,
-        content=article.content,
-        update_date=article.update_date
+    return fast_json_response(article, response, status_code=201)
+
+
+@router.post("/batch", response_model=List[ArticleBatchItemResult])
+async def create_articles_batch(
+        articles_data: CreateArticlesBatchData,
+        request: Request,
+        response: Response,
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
+):
+    await check_rate_limit(
+        "create_article_batch", request, response, current_user.user_id, len(articles_data)
     )
+    results = await ArticleModelWorker.create_new_articles(
+        db_sess,
+        [(current_user.user_id, article_data) for article_data in articles_data]
+    )
+    batch_results = []
+    for index, result in enumerate(results):
+        if isinstance(result, errors.UserNotFoundError):
+            batch_results.append(ArticleBatchItemResult(
+                index=index, status_code=404, detail="User not found"
+            ))
+        else:
+            batch_results.append(ArticleBatchItemResult(
+                index=index, status_code=201, article=result
+            ))
+    return batch_results
+
+
+@router.get("/batch", response_model=List[ArticleLookupResult])
+async def get_articles_batch(
+        ids: List[int] = Query(..., min_items=1, max_items=cst.MULTI_GET_MAX_IDS),
+        db_sess: AsyncSession = Depends(get_read_db)
+):
+    articles = await ArticleModelWorker.get_articles_by_ids(db_sess, ids)
+    return [
+        ArticleLookupResult(article_id=article_id, found=article is not None, article=article)
+        for article_id, article in zip(ids, articles)
+    ]
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_articles(author_ids: Optional[List[int]] = Query(None)):
+    return StreamingResponse(
+        ndjson_stream(ArticleModelWorker.export_articles(author_ids)),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/search", response_model=List[ArticleSearchResult])
+async def search_articles(
+        query: str = Query(..., min_length=1),
+        limit: int = Query(10, gt=0, le=100),
+        offset: int = Query(0, ge=0),
+        author_ids: Optional[List[int]] = Query(None),
+        db_sess: AsyncSession = Depends(get_read_db)
+):
+    return await ArticleModelWorker.search_articles(db_sess, query, limit, offset, author_ids)
 
 
 @router.get("/{article_id}", response_model=ArticleOut)
-async def get_article(article_id: int):
+async def get_article(
+        article_id: int,
+        request: Request,
+        response: Response,
+        db_sess: AsyncSession = Depends(get_read_db)
+):
     try:
-        return ArticleModelWorker.get_article(article_id)
+        if has_conditional_headers(request):
+            update_date = await ArticleModelWorker.get_article_update_date(db_sess, article_id)
+            etag = make_etag("article", article_id, update_date)
+            if is_not_modified(request, etag, update_date):
+                return not_modified(response, etag, update_date)
+        article = await ArticleModelWorker.get_article(db_sess, article_id)
     except errors.ArticleNotFoundError:
         raise HTTPException(
             status_code=404,
             detail="Article not found"
         )
+    set_validators(
+        response,
+        make_etag("article", article.article_id, article.update_date),
+        article.update_date
+    )
+    return fast_json_response(article, response)
 
 
-@router.get("/", response_model=List[ArticleOut])
+@router.get("/", response_model=List[ArticleExpandedOut], response_model_exclude_unset=True)
 async def get_articles(
+        request: Request,
+        response: Response,
         limit: int = Query(10, gt=0, le=100),
         offset: int = Query(0, ge=0),
         author_ids: Optional[List[int]] = Query(None),
         title_search_string: Optional[str] = Query(None, min_length=3),
-        title_search_mode: SearchByTitleModes = SearchByTitleModes.STARTSWITH
+        title_search_mode: SearchByTitleModes = SearchByTitleModes.STARTSWITH,
+        cursor: Optional[str] = Query(None),
+        include: Set[ArticleIncludes] = Depends(get_include(ArticleIncludes)),
+        order_by: ArticleOrder = Query(ArticleOrder.ID),
+        fields: Optional[Set[ArticleField]] = Depends(get_fields(ArticleField)),
+        db_sess: AsyncSession = Depends(get_read_db)
 ):
-    articles = ArticleModelWorker.get_articles(
-        limit,
-        offset,
-        author_ids,
-        title_search_string,
-        title_search_mode
-    )
-    return articles
+    try:
+        articles = await ArticleModelWorker.get_articles(
+            db_sess,
+            limit,
+            offset,
+            author_ids,
+            title_search_string,
+            title_search_mode,
+            cursor,
+            include,
+            order_by,
+            fields
+        )
+    except errors.InvalidCursorError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    if len(articles) == limit and (
+            title_search_string is None or title_search_mode != SearchByTitleModes.FULL_TEXT
+    ):
+        if order_by == ArticleOrder.COMMENTS_COUNT:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                articles[-1].comments_count, articles[-1].article_id
+            )
+        else:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(articles[-1].article_id)
+    etag = make_etag(sorted(fields or ()), *articles)
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return fast_json_response(articles, response)
 
 
 @router.put("/{article_id}", response_model=ArticleOut)
 async def edit_article(
         article_id: int,
         article_data: EditArticleData,
-        current_user: UserInDB = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        article = ArticleModelWorker.edit_article(current_user.user_id, article_id, article_data)
+        article = await ArticleModelWorker.edit_article(
+            db_sess,
+            current_user.user_id, article_id, article_data
+        )
     except errors.ArticleNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -90,10 +216,11 @@ async def edit_article(
 @router.delete("/{article_id}", response_model=None)
 async def delete_article(
         article_id: int,
-        current_user: UserInDB = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        ArticleModelWorker.delete_article(current_user.user_id, article_id)
+        await ArticleModelWorker.delete_article(db_sess, current_user.user_id, article_id)
     except errors.ArticleNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -1,10 +1,23 @@
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, List, Set
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from model_workers.comments import CommentModelWorker
-from models.comments import CommentInDB, CommentOut, CreateCommentData, EditCommentData
-from models.users import UserInDB
+from model_workers.export import ndjson_stream
+from model_workers.pagination import encode_cursor, NEXT_CURSOR_HEADER
+from models.comments import CommentInDB, CommentOut, CreateCommentData, EditCommentData, \
+    CreateCommentsBatchData, CommentBatchItemResult, CommentLookupResult, \
+    CommentIncludes, CommentExpandedOut
+from models.tokens import TokenData
 from depends.get_current_user import get_current_user
+from depends.get_db import get_db, get_read_db
+from depends.get_include import get_include
+from depends.rate_limit import rate_limit, check_rate_limit
+from depends.conditional_get import make_etag, has_conditional_headers, is_not_modified, \
+    set_validators, not_modified
+from depends.fast_json import fast_json_response
 from depends import errors
+import constants as cst
 
 router = APIRouter(
     prefix="/comments",
@@ -13,13 +26,22 @@ router = APIRouter(
 )
 
 
-@router.post("/", response_model=CommentOut, status_code=201)
+@router.post(
+    "/",
+    response_model=CommentOut,
+    status_code=201,
+    dependencies=[Depends(rate_limit("create_comment"))]
+)
 async def create_comment(
         comment_data: CreateCommentData,
-        current_user: UserInDB = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        comment: CommentInDB = CommentModelWorker.create_comment(current_user.user_id, comment_data)
+        comment: CommentInDB = await CommentModelWorker.create_comment(
+            db_sess,
+            current_user.user_id, comment_data
+        )
     except errors.UserNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -33,42 +55,134 @@ async def create_comment(
     return comment
 
 
+@router.post("/batch", response_model=List[CommentBatchItemResult])
+async def create_comments_batch(
+        comments_data: CreateCommentsBatchData,
+        request: Request,
+        response: Response,
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
+):
+    await check_rate_limit(
+        "create_comment_batch", request, response, current_user.user_id, len(comments_data)
+    )
+    results = await CommentModelWorker.create_comments(
+        db_sess,
+        [(current_user.user_id, comment_data) for comment_data in comments_data]
+    )
+    batch_results = []
+    for index, result in enumerate(results):
+        if isinstance(result, errors.UserNotFoundError):
+            batch_results.append(CommentBatchItemResult(
+                index=index, status_code=404, detail="User not found"
+            ))
+        elif isinstance(result, errors.ArticleNotFoundError):
+            batch_results.append(CommentBatchItemResult(
+                index=index, status_code=404, detail="Article not found"
+            ))
+        else:
+            batch_results.append(CommentBatchItemResult(
+                index=index, status_code=201, comment=result
+            ))
+    return batch_results
+
+
+@router.get("/batch", response_model=List[CommentLookupResult])
+async def get_comments_batch(
+        ids: List[int] = Query(..., min_items=1, max_items=cst.MULTI_GET_MAX_IDS),
+        db_sess: AsyncSession = Depends(get_read_db)
+):
+    comments = await CommentModelWorker.get_comments_by_ids(db_sess, ids)
+    return [
+        CommentLookupResult(comment_id=comment_id, found=comment is not None, comment=comment)
+        for comment_id, comment in zip(ids, comments)
+    ]
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_comments(
+        author_ids: Optional[List[int]] = Query(None),
+        article_ids: Optional[List[int]] = Query(None)
+):
+    return StreamingResponse(
+        ndjson_stream(CommentModelWorker.export_comments(author_ids, article_ids)),
+        media_type="application/x-ndjson"
+    )
+
+
 @router.get("/{comment_id}", response_model=CommentOut)
-async def get_comment(comment_id: int):
+async def get_comment(
+        comment_id: int,
+        request: Request,
+        response: Response,
+        db_sess: AsyncSession = Depends(get_read_db)
+):
     try:
-        comment: CommentInDB = CommentModelWorker.get_comment(comment_id)
+        if has_conditional_headers(request):
+            update_date = await CommentModelWorker.get_comment_update_date(db_sess, comment_id)
+            etag = make_etag("comment", comment_id, update_date)
+            if is_not_modified(request, etag, update_date):
+                return not_modified(response, etag, update_date)
+        comment: CommentInDB = await CommentModelWorker.get_comment(db_sess, comment_id)
     except errors.CommentNotFoundError:
         raise HTTPException(
             status_code=404,
             detail="Comment not found"
         )
-    return comment
+    set_validators(
+        response,
+        make_etag("comment", comment.comment_id, comment.update_date),
+        comment.update_date
+    )
+    return fast_json_response(comment, response)
 
 
-@router.get("/", response_model=List[CommentOut])
+@router.get("/", response_model=List[CommentExpandedOut], response_model_exclude_unset=True)
 async def get_comments(
+        request: Request,
+        response: Response,
         limit: int = Query(10, gt=0, le=100),
         offset: int = Query(0, ge=0),
         author_ids: Optional[List[int]] = Query(None),
-        article_ids: Optional[List[int]] = Query(None)
+        article_ids: Optional[List[int]] = Query(None),
+        cursor: Optional[str] = Query(None),
+        include: Set[CommentIncludes] = Depends(get_include(CommentIncludes)),
+        db_sess: AsyncSession = Depends(get_read_db)
 ):
-    comments: List[CommentInDB] = CommentModelWorker.get_comments(
-        limit,
-        offset,
-        author_ids,
-        article_ids
-    )
-    return comments
+    try:
+        comments: List[CommentInDB] = await CommentModelWorker.get_comments(
+            db_sess,
+            limit,
+            offset,
+            author_ids,
+            article_ids,
+            cursor,
+            include
+        )
+    except errors.InvalidCursorError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    if len(comments) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(comments[-1].comment_id)
+    etag = make_etag(*comments)
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return fast_json_response(comments, response)
 
 
 @router.put("/{comment_id}", response_model=CommentOut)
 async def edit_comment(
         comment_id: int,
         comment_data: EditCommentData,
-        current_user: UserInDB = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        comment: CommentInDB = CommentModelWorker.edit_comment(
+        comment: CommentInDB = await CommentModelWorker.edit_comment(
+            db_sess,
             current_user.user_id,
             comment_id,
             comment_data
@@ -89,10 +203,11 @@ async def edit_comment(
 @router.delete("/{comment_id}", response_model=None)
 async def delete_comment(
         comment_id: int,
-        current_user: UserInDB = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        CommentModelWorker.delete_comment(current_user.user_id, comment_id)
+        await CommentModelWorker.delete_comment(db_sess, current_user.user_id, comment_id)
     except errors.CommentNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from data import db_session
+from depends.metrics import registry, Gauge, CallbackCounter
+from depends.password_hash import password_hash_pool
+
+router = APIRouter(tags=["stats"])
+
+
+def _pool_gauge(name: str, documentation: str, key: str) -> None:
+    registry.register(Gauge(name, documentation, ("pool",), lambda: [
+        ((pool,), stats[key]) for pool, stats in db_session.get_pool_stats().items()
+    ]))
+
+
+def _password_hash_gauge(name: str, documentation: str, key: str) -> None:
+    registry.register(Gauge(name, documentation, (), lambda: [
+        ((), password_hash_pool.stats()[key])
+    ]))
+
+
+_pool_gauge("aquahub_db_pool_size", "Connections kept open by the pool.", "size")
+_pool_gauge("aquahub_db_pool_checked_out", "Connections currently in use.", "checked_out")
+_pool_gauge("aquahub_db_pool_overflow", "Connections opened above the pool size.", "overflow")
+_password_hash_gauge(
+    "aquahub_password_hash_queue_depth", "Password hash calls waiting for a worker.", "queue_depth"
+)
+_password_hash_gauge(
+    "aquahub_password_hash_in_flight", "Password hash calls running now.", "in_flight"
+)
+registry.register(CallbackCounter(
+    "aquahub_password_hash_rejected_total",
+    "Password hash calls rejected as the queue was full.",
+    (),
+    lambda: [((), password_hash_pool.stats()["rejected"])]
+))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+
+from data import db_session
+from depends.password_hash import password_hash_pool
+from model_workers.query_cache import query_cache
+from models.stats import PasswordHashStats, DbPoolsStats, QueryCacheStats
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"]
+)
+
+
+@router.get("/password_hash", response_model=PasswordHashStats)
+async def get_password_hash_stats():
+    return password_hash_pool.stats()
+
+
+@router.get("/db_pool", response_model=DbPoolsStats)
+async def get_db_pool_stats():
+    return db_session.get_pool_stats()
+
+
+@router.get("/cache", response_model=QueryCacheStats)
+async def get_query_cache_stats():
+    return query_cache.stats()
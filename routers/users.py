@@ -1,13 +1,26 @@
-from typing import Optional, List
+from typing import Optional, List, Set
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from depends.get_current_user import get_current_user
+from depends.get_db import get_db, get_read_db
+from depends.get_fields import get_fields
+from depends.rate_limit import rate_limit
+from depends.conditional_get import make_etag, is_not_modified, set_validators, not_modified
+from depends.fast_json import fast_json_response
 from depends import errors
 
 from models.users import UserOut, UserRegistrationData, \
-    UserInDB, UserEditData, UserMeOut, SearchByNicknameMode
+    UserInDB, UserEditData, UserMeOut, SearchByNicknameMode, UserLookupResult, \
+    UserOrder, UserField
+from models.tokens import TokenData
 from model_workers.users import UserModelWorker
+from model_workers.export import ndjson_stream
+from model_workers.pagination import encode_cursor, NEXT_CURSOR_HEADER
+
+import constants as cst
 
 router = APIRouter(
     prefix="/users",
@@ -16,10 +29,18 @@ router = APIRouter(
 )
 
 
-@router.post("/", status_code=201, response_model=UserOut)
-async def register(user_data: UserRegistrationData):
+@router.post(
+    "/",
+    status_code=201,
+    response_model=UserOut,
+    dependencies=[Depends(rate_limit("register"))]
+)
+async def register(
+        user_data: UserRegistrationData,
+        db_sess: AsyncSession = Depends(get_db)
+):
     try:
-        db_user: UserInDB = UserModelWorker.create_new_user(user_data)
+        db_user: UserInDB = await UserModelWorker.create_new_user(db_sess, user_data)
     except errors.NicknameAlreadyUseError:
         raise HTTPException(
             status_code=400,
@@ -30,64 +51,144 @@ async def register(user_data: UserRegistrationData):
             status_code=400,
             detail="Email already use"
         )
+    except errors.PasswordHashQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(cst.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS)}
+        )
     return UserOut(
         user_id=db_user.user_id,
         nickname=db_user.nickname,
         description=db_user.description,
-        registration_date=db_user.registration_date
+        registration_date=db_user.registration_date,
+        articles_count=db_user.articles_count,
+        comments_count=db_user.comments_count
     )
 
 
-@router.get("/", response_model=List[UserOut])
+@router.get("/", response_model=List[UserOut], response_model_exclude_unset=True)
 async def get_all_users(
+        request: Request,
+        response: Response,
         limit: int = Query(10, gt=0, le=100),
         offset: int = Query(0, ge=0),
         nickname_search_string: Optional[str] = Query(None, min_length=3),
-        nickname_search_mode: SearchByNicknameMode = Query(SearchByNicknameMode.STARTSWITH)
+        nickname_search_mode: SearchByNicknameMode = Query(SearchByNicknameMode.STARTSWITH),
+        cursor: Optional[str] = Query(None),
+        order_by: UserOrder = Query(UserOrder.ID),
+        fields: Optional[Set[UserField]] = Depends(get_fields(UserField)),
+        db_sess: AsyncSession = Depends(get_read_db)
 ):
-    return [UserOut(
-        user_id=user.user_id,
-        nickname=user.nickname,
-        description=user.description,
-        registration_date=user.registration_date
-    ) for user in UserModelWorker.get_users(
-        limit,
-        offset,
-        nickname_search_string,
-        nickname_search_mode
-    )]
+    try:
+        users = await UserModelWorker.get_users(
+            db_sess,
+            limit,
+            offset,
+            nickname_search_string,
+            nickname_search_mode,
+            cursor,
+            order_by,
+            fields
+        )
+    except errors.InvalidCursorError:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+    if len(users) == limit and order_by == UserOrder.ID:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(users[-1].user_id)
+    elif len(users) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            getattr(users[-1], order_by.value), users[-1].user_id
+        )
+    etag = make_etag(sorted(fields or ()), *users)
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return fast_json_response(users, response)
 
 
 @router.get("/me", response_model=UserMeOut)
-async def read_users_me(current_user: UserMeOut = Depends(get_current_user)):
-    return current_user
+async def read_users_me(
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_read_db)
+):
+    try:
+        return await UserModelWorker.get_user(db_sess, current_user.user_id)
+    except errors.UserNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail="User not found"
+        )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_users():
+    return StreamingResponse(
+        ndjson_stream(UserModelWorker.export_users()),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.get("/batch", response_model=List[UserLookupResult])
+async def get_users_batch(
+        ids: List[int] = Query(..., min_items=1, max_items=cst.MULTI_GET_MAX_IDS),
+        db_sess: AsyncSession = Depends(get_read_db)
+):
+    users = await UserModelWorker.get_users_by_ids(db_sess, ids)
+    return [
+        UserLookupResult(
+            user_id=user_id,
+            found=user is not None,
+            user=UserOut(
+                user_id=user.user_id,
+                nickname=user.nickname,
+                description=user.description,
+                registration_date=user.registration_date,
+                articles_count=user.articles_count,
+                comments_count=user.comments_count
+            ) if user is not None else None
+        ) for user_id, user in zip(ids, users)
+    ]
 
 
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(
-        user_id: int
+        user_id: int,
+        request: Request,
+        response: Response,
+        db_sess: AsyncSession = Depends(get_read_db)
 ):
     try:
-        user = UserModelWorker.get_user(user_id)
+        user = await UserModelWorker.get_user(db_sess, user_id)
     except errors.UserNotFoundError:
         raise HTTPException(
             status_code=404, detail="User not found"
         )
-    return UserOut(
+    user = UserOut.construct(
         user_id=user.user_id,
         nickname=user.nickname,
         description=user.description,
-        registration_date=user.registration_date
+        registration_date=user.registration_date,
+        articles_count=user.articles_count,
+        comments_count=user.comments_count
     )
+    etag = make_etag(user)
+    if is_not_modified(request, etag):
+        return not_modified(response, etag)
+    set_validators(response, etag)
+    return fast_json_response(user, response)
 
 
-@router.put("/", response_model=UserOut)
+@router.put("/", response_model=UserOut, dependencies=[Depends(rate_limit("edit_user"))])
 async def edit_user(
         user_data: UserEditData,
-        current_user: UserOut = Depends(get_current_user)
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
 ):
     try:
-        user: UserOut = UserModelWorker.edit_user(current_user.user_id, user_data)
+        user: UserOut = await UserModelWorker.edit_user(db_sess, current_user.user_id, user_data)
     except errors.UserNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -98,13 +199,22 @@ async def edit_user(
             status_code=400,
             detail="Email already use"
         )
+    except errors.PasswordHashQueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(cst.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS)}
+        )
     return user
 
 
 @router.delete("/", response_model=None)
-async def delete_user(current_user: UserOut = Depends(get_current_user)):
+async def delete_user(
+        current_user: TokenData = Depends(get_current_user),
+        db_sess: AsyncSession = Depends(get_db)
+):
     try:
-        UserModelWorker.delete_user(current_user.user_id)
+        await UserModelWorker.delete_user(db_sess, current_user.user_id)
     except errors.UserNotFoundError:
         raise HTTPException(
             status_code=404,
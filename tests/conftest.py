@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import db_session
+import constants as cst
+
+# main.py initialises db/aquahub.db on import; global_init keeps the first database.
+db_session.global_init(os.path.join(tempfile.mkdtemp(prefix="aquahub-tests-"), "aquahub.db"))
+cst.RATE_LIMIT_ENABLED = False
+
+DATASET_USERS = 5
+DATASET_ARTICLES = 120
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    from data.articles import Article
+    from data.comments import Comment
+    from data.counters import recompute_counters
+    from data.users import User
+    with db_session.session_scope() as db_sess:
+        db_sess.add_all(
+            User(nickname=f"user{i}", email=f"user{i}@aquahub.io", hashed_password="hash")
+            for i in range(1, DATASET_USERS + 1)
+        )
+        db_sess.flush()
+        db_sess.add_all(
+            Article(author_id=i % DATASET_USERS + 1, title=f"Article {i}", content="Content")
+            for i in range(1, DATASET_ARTICLES + 1)
+        )
+        db_sess.flush()
+        db_sess.add_all(
+            Comment(article_id=i % DATASET_ARTICLES + 1, author_id=i % DATASET_USERS + 1,
+                    content=f"Comment {i}")
+            for i in range(1, DATASET_ARTICLES * 5 + 1)
+        )
+        db_sess.flush()
+        recompute_counters(db_sess.connection())
@@ -0,0 +1,35 @@
+import sqlalchemy as sa
+
+from data.db_session import SqlAlchemyBase
+from data.migrations import migrate
+from model_workers.bulk_import import run_import
+
+
+def _index_names(connection):
+    return set(connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).scalars())
+
+
+def test_malformed_line_is_rejected_and_indexes_are_rebuilt(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    with engine.connect() as connection:
+        index_names = _index_names(connection)
+    users = tmp_path / "users.ndjson"
+    users.write_text('{"nickname": "alice", "email": "alice@aquahub.io", "hashed_password": "h"}\n')
+    articles = tmp_path / "articles.ndjson"
+    articles.write_text(
+        '{"author_id": 1, "title": "Guppy care", "content": "Warm water"}\n'
+        '{bad json\n'
+        '{"author_id": 1, "title": "Betta care", "content": "Calm water"}\n'
+    )
+    assert run_import(engine, "users", str(users), "ndjson", 100, True) == []
+    errors = run_import(engine, "articles", str(articles), "ndjson", 100, True)
+    assert len(errors) == 1 and errors[0].startswith("line 2:")
+    with engine.connect() as connection:
+        assert _index_names(connection) == index_names
+        assert connection.exec_driver_sql(
+            "SELECT rowid FROM articles_fts WHERE articles_fts MATCH 'care' ORDER BY rowid"
+        ).scalars().all() == [1, 2]
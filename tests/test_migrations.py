@@ -0,0 +1,99 @@
+import sqlalchemy as sa
+
+from data.db_session import SqlAlchemyBase
+from data.migrations import MIGRATIONS, migrate, get_schema_version
+from data.query_plans import find_table_scans
+from data.users import User
+
+# Schema created by the first release, before any migration existed.
+BASELINE_DDL = [
+    """
+    CREATE TABLE users (
+        user_id INTEGER NOT NULL PRIMARY KEY,
+        nickname VARCHAR(64) NOT NULL UNIQUE,
+        email VARCHAR(64) NOT NULL UNIQUE,
+        hashed_password VARCHAR(512) NOT NULL,
+        registration_date DATETIME,
+        description VARCHAR(256)
+    )
+    """,
+    "CREATE INDEX ix_users_nickname ON users (nickname)",
+    """
+    CREATE TABLE articles (
+        article_id INTEGER NOT NULL PRIMARY KEY,
+        title VARCHAR(256) NOT NULL,
+        author_id INTEGER NOT NULL REFERENCES users (user_id),
+        content VARCHAR(4096),
+        update_date DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE comments (
+        comment_id INTEGER NOT NULL PRIMARY KEY,
+        article_id INTEGER NOT NULL REFERENCES articles (article_id),
+        author_id INTEGER NOT NULL REFERENCES users (user_id),
+        content VARCHAR(1024) NOT NULL,
+        update_date DATETIME
+    )
+    """,
+    """
+    INSERT INTO users (user_id, nickname, email, hashed_password, registration_date)
+    VALUES (1, 'alice', 'alice@aquahub.io', 'hash', '2024-01-01 00:00:00.000000')
+    """,
+    """
+    INSERT INTO articles (article_id, title, author_id, content, update_date)
+    VALUES (1, 'Guppy care', 1, 'Warm water', '2024-01-01 00:00:00.000000')
+    """,
+]
+
+
+def upgrade_baseline_database(path) -> sa.engine.Engine:
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        for statement in BASELINE_DDL:
+            connection.exec_driver_sql(statement)
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    return engine
+
+
+def test_baseline_database_is_upgraded(tmp_path):
+    engine = upgrade_baseline_database(tmp_path / "baseline.db")
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == MIGRATIONS[-1][0]
+        assert connection.exec_driver_sql(
+            "SELECT token_version, articles_count FROM users WHERE user_id = 1"
+        ).one() == (0, 1)
+        assert connection.exec_driver_sql(
+            "SELECT rowid FROM articles_fts WHERE articles_fts MATCH 'guppy'"
+        ).scalars().all() == [1]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    SqlAlchemyBase.metadata.create_all(engine)
+    migrate(engine)
+    with engine.connect() as connection:
+        assert find_table_scans(connection) == []
+
+
+def test_upgraded_hot_queries_use_indexes(tmp_path):
+    engine = upgrade_baseline_database(tmp_path / "baseline.db")
+    with engine.connect() as connection:
+        assert find_table_scans(connection) == []
+
+
+def test_upgraded_users_never_reuse_ids(tmp_path):
+    engine = upgrade_baseline_database(tmp_path / "baseline.db")
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM articles")
+        connection.exec_driver_sql("DELETE FROM users")
+        connection.exec_driver_sql(
+            "INSERT INTO users (nickname, email, hashed_password) VALUES ('bob', 'b@b.io', 'h')"
+        )
+        assert connection.exec_driver_sql(
+            "SELECT user_id FROM users WHERE nickname = 'bob'"
+        ).scalar() == 2
+        assert {index.name for index in User.__table__.indexes} <= set(connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE tbl_name = 'users' AND type = 'index'"
+        ).scalars())
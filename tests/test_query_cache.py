@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+
+from data import db_session
+from data.sql_instrumentation import totals
+from model_workers.comments import CommentModelWorker
+from models.comments import CreateCommentData
+from main import app
+
+CACHED_LISTS = [
+    ("/articles/", {"limit": 10}),
+    ("/users/", {"limit": 10, "fields": "nickname"}),
+]
+COUNTER_LISTS = [
+    ("/articles/", {"limit": 10, "include": "comments_count"}),
+    ("/articles/", {"limit": 10, "order_by": "comments_count"}),
+    ("/users/", {"limit": 10}),
+    ("/users/", {"limit": 10, "fields": "nickname", "order_by": "comments_count"}),
+]
+
+
+async def _statements_after_comment():
+    async def count_statements(lists):
+        counts = []
+        for path, params in lists:
+            statements = totals["statements"]
+            assert (await client.get(path, params=params)).status_code == 200
+            counts.append(totals["statements"] - statements)
+        return counts
+
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            await count_statements(CACHED_LISTS + COUNTER_LISTS)
+            async with db_session.async_session_scope() as db_sess:
+                await CommentModelWorker.create_comment(
+                    db_sess, 1, CreateCommentData(article_id=1, content="New comment")
+                )
+            return await count_statements(CACHED_LISTS), await count_statements(COUNTER_LISTS)
+    finally:
+        await db_session.dispose()
+
+
+def test_comment_only_invalidates_lists_with_counters(dataset):
+    cached, reloaded = asyncio.run(_statements_after_comment())
+    assert cached == [0] * len(CACHED_LISTS)
+    assert all(count > 0 for count in reloaded)
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from data import db_session
+from data.sql_instrumentation import totals
+from model_workers.query_cache import query_cache
+from main import app
+
+ARTICLE_INCLUDE = "author,comments_count,latest_comments"
+
+
+async def _count_statements(path: str, params_list):
+    counts = []
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            for params in params_list:
+                statements = totals["statements"]
+                response = await client.get(path, params=params)
+                assert response.status_code == 200
+                assert len(response.json()) == params["limit"]
+                counts.append(totals["statements"] - statements)
+    finally:
+        # Pooled aiosqlite connections belong to this event loop.
+        await db_session.dispose()
+    return counts
+
+
+@pytest.fixture(autouse=True)
+def no_query_cache(monkeypatch):
+    monkeypatch.setattr(query_cache, "enabled", False)
+
+
+def test_article_list_includes_use_fixed_query_count(dataset):
+    counts = asyncio.run(_count_statements("/articles/", [
+        {"limit": 10, "include": ARTICLE_INCLUDE},
+        {"limit": 100, "include": ARTICLE_INCLUDE},
+    ]))
+    # The page itself with author and comments_count joined in, then latest_comments.
+    assert counts == [2, 2]
+
+
+def test_comment_list_includes_use_fixed_query_count(dataset):
+    counts = asyncio.run(_count_statements("/comments/", [
+        {"limit": 10, "include": "author"},
+        {"limit": 100, "include": "author"},
+    ]))
+    assert counts == [1, 1]
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException, Request, Response
+
+from data import db_session
+from depends import rate_limit
+from main import app
+import constants as cst
+
+
+@pytest.fixture(autouse=True)
+def memory_buckets(monkeypatch):
+    monkeypatch.setattr(cst, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "rate_limit_store", rate_limit.MemoryBucketStore(100))
+
+
+def _charge(cost: int) -> int:
+    request = Request({"type": "http", "headers": [], "client": ("192.0.2.1", 1234)})
+    try:
+        asyncio.run(rate_limit.check_rate_limit("create_article", request, Response(), 1, cost))
+    except HTTPException as error:
+        return error.status_code
+    return 200
+
+
+def test_batch_pays_for_every_item():
+    capacity = min(rule[1] for rule in cst.RATE_LIMITS["create_article"])
+    assert _charge(capacity) == 200
+    assert _charge(1) == 429
+
+
+def test_batch_larger_than_bucket_is_rejected():
+    capacity = min(rule[1] for rule in cst.RATE_LIMITS["create_article"])
+    assert _charge(capacity + 1) == 413
+    assert _charge(capacity) == 200
+
+
+async def _post_full_batches():
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            assert (await client.post("/users/", json={
+                "nickname": "batcher", "email": "batcher@aquahub.io", "password": "password123"
+            })).status_code == 201
+            token = (await client.post("/login", json={
+                "nickname": "batcher", "password": "password123"
+            })).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            articles = await client.post("/articles/batch", headers=headers, json=[
+                {"title": f"Batch {i}", "content": "Content"} for i in range(cst.BATCH_MAX_SIZE)
+            ])
+            article_id = articles.json()[0]["article"]["article_id"]
+            comments = await client.post("/comments/batch", headers=headers, json=[
+                {"article_id": article_id, "content": f"Comment {i}"}
+                for i in range(cst.BATCH_MAX_SIZE)
+            ])
+            return articles, comments
+    finally:
+        await db_session.dispose()
+
+
+def test_full_batches_pass_default_limits():
+    for response in asyncio.run(_post_full_batches()):
+        assert response.status_code == 200
+        assert {item["status_code"] for item in response.json()} == {201}
+
+
+def test_denied_request_takes_no_tokens():
+    buckets = [("user:1", 10, 0.001), ("ip:192.0.2.1", 1, 0.001)]
+    store = rate_limit.MemoryBucketStore(100)
+    assert all(state.allowed for state in asyncio.run(store.take(buckets, 1)))
+    denied = asyncio.run(store.take(buckets, 1))
+    assert not denied[1].allowed
+    assert 8.9 < denied[0].tokens < 9.1
+
+
+def test_sqlite_store_matches_memory_store(tmp_path):
+    buckets = [("user:1", 3, 0.001), ("ip:192.0.2.1", 2, 0.001)]
+    stores = [
+        rate_limit.MemoryBucketStore(100),
+        rate_limit.SqliteBucketStore(str(tmp_path / "buckets.db"))
+    ]
+    results = [
+        [[state.allowed for state in asyncio.run(store.take(buckets, 1))] for _ in range(4)]
+        for store in stores
+    ]
+    assert results[0] == results[1] == [[True, True]] * 2 + [[True, False]] * 2
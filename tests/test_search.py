@@ -0,0 +1,25 @@
+import asyncio
+
+import httpx
+
+from data import db_session
+from main import app
+
+
+async def _search(queries):
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return [
+                await client.get("/articles/search", params={"query": query}) for query in queries
+            ]
+    finally:
+        await db_session.dispose()
+
+
+def test_search_without_terms_returns_nothing(dataset):
+    responses = asyncio.run(_search(['"', "*", "- +", "Article"]))
+    assert [response.status_code for response in responses] == [200] * 4
+    assert [response.json() for response in responses[:3]] == [[], [], []]
+    assert responses[3].json()
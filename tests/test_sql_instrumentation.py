@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+from sqlalchemy import insert
+
+from data import db_session
+from data.articles import Article
+from main import app
+import constants as cst
+
+EXPORT_ARTICLES = 12 * cst.EXPORT_CHUNK_SIZE
+
+
+async def _export_articles():
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            return await client.get("/articles/export")
+    finally:
+        await db_session.dispose()
+
+
+def test_export_runs_in_strict_mode(dataset, monkeypatch):
+    with db_session.session_scope() as db_sess:
+        db_sess.execute(insert(Article), [
+            {"author_id": 1, "title": f"Exported {i}", "content": "Content"}
+            for i in range(EXPORT_ARTICLES)
+        ])
+        total = db_sess.query(Article).count()
+    monkeypatch.setattr(cst, "SQL_STRICT_MODE", True)
+    response = asyncio.run(_export_articles())
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == total
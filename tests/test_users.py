@@ -0,0 +1,39 @@
+import asyncio
+
+import httpx
+
+from data import db_session
+from main import app
+
+
+async def _register_and_login(client, nickname: str) -> dict:
+    response = await client.post("/users/", json={
+        "nickname": nickname, "email": f"{nickname}@aquahub.io", "password": "password123"
+    })
+    assert response.status_code == 201
+    response = await client.post("/login", json={"nickname": nickname, "password": "password123"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _delete_and_register_again():
+    try:
+        async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            deleted_headers = await _register_and_login(client, "deleted")
+            assert (await client.delete("/users/", headers=deleted_headers)).status_code == 200
+            new_headers = await _register_and_login(client, "newcomer")
+            return (
+                await client.get("/users/me", headers=deleted_headers),
+                await client.get("/users/me", headers=new_headers)
+            )
+    finally:
+        await db_session.dispose()
+
+
+def test_deleted_user_token_does_not_reach_next_user():
+    deleted_me, new_me = asyncio.run(_delete_and_register_again())
+    assert deleted_me.status_code == 401
+    assert new_me.status_code == 200
+    assert new_me.json()["nickname"] == "newcomer"